@@ -0,0 +1,76 @@
+# coding: utf-8
+
+"""
+Embeddium - Startup Benchmark
+
+Measures the time from interpreter start until the main window first paints.
+Every run is a fresh process so nothing is already imported or cached in memory.
+
+--eager imports the ML stack before building the window, the way the
+application used to, which gives the "before" number to compare against.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--eager]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+CHILD = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+if {eager!r}:
+    import torch, sentence_transformers, pandas, h5py, faiss, chardet
+from PyQt5.QtCore import QObject, QEvent
+from PyQt5.QtWidgets import QApplication
+from main import Window
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            print(time.perf_counter() - start, flush=True)
+            app.quit()
+        return False
+
+app = QApplication(sys.argv)
+w = Window()
+firstPaint = FirstPaint()
+w.installEventFilter(firstPaint)
+w.show()
+app.exec_()
+"""
+
+
+def time_to_first_paint(eager):
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD.format(src=SRC_DIR, eager=eager)],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure time to first paint of the main window.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--eager', action='store_true', help='Import the ML stack up front (old behaviour)')
+    args = parser.parse_args()
+
+    times = [time_to_first_paint(args.eager) for _ in range(args.runs)]
+    print(json.dumps({
+        "mode": "eager" if args.eager else "lazy",
+        "runs": args.runs,
+        "median": round(statistics.median(times), 3),
+        "min": round(min(times), 3),
+        "max": round(max(times), 3),
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+
+import psutil
+
+from backend import readers
+from backend.benchmark import PeakMemory
+
+TUNING_FILE = os.path.join(os.path.expanduser('~'), '.embeddium', 'batch_sizes.json')
+CANDIDATE_BATCH_SIZES = [8, 16, 32, 64, 128, 256, 512, 1024]
+SAMPLE_ROWS = 1024
+PROBE_BATCHES = 2
+# A size is only picked if its peak memory stays below this share of what was free.
+MEMORY_HEADROOM = 0.8
+# Bigger batches cost latency and memory, so they have to be clearly faster to win.
+MIN_SPEEDUP = 1.05
+
+
+def tuning_key(model_name, device):
+    return f"{model_name}|{device}"
+
+
+def load_batch_size(model_name, device, path=TUNING_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)[tuning_key(model_name, device)]["batch_size"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_batch_size(model_name, device, result, path=TUNING_FILE):
+    try:
+        with open(path) as f:
+            tuned = json.load(f)
+    except (OSError, ValueError):
+        tuned = {}
+    tuned[tuning_key(model_name, device)] = {**result, "tuned_at": time.strftime('%Y-%m-%dT%H:%M:%S')}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(tuned, f, indent=2)
+
+
+def is_out_of_memory(error):
+    return isinstance(error, MemoryError) or 'out of memory' in str(error).lower()
+
+
+def probe(model, texts, batch_size):
+    """Returns (sentences/sec, peak bytes used) for encoding a few batches of ``texts``."""
+    import torch
+
+    # Short samples are repeated so every probe encodes full batches.
+    texts = (texts * (batch_size * (PROBE_BATCHES + 1) // len(texts) + 1))[:batch_size * (PROBE_BATCHES + 1)]
+    batches = list(readers.iter_batches(texts, batch_size))
+    cuda = model.device.type == 'cuda'
+    if cuda:
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats(model.device)
+        baseline = torch.cuda.memory_allocated(model.device)
+
+    with PeakMemory() as memory:
+        # The first batch warms up kernels and allocator for this shape and isn't timed.
+        model.encode(batches[0], batch_size=batch_size)
+        start_time = time.perf_counter()
+        for batch in batches[1:]:
+            model.encode(batch, batch_size=batch_size)
+        elapsed = time.perf_counter() - start_time
+
+    speed = batch_size * PROBE_BATCHES / elapsed if elapsed > 0 else 0
+    if cuda:
+        return speed, torch.cuda.max_memory_allocated(model.device) - baseline
+    return speed, memory.peak - memory.start
+
+
+def free_memory(model):
+    import torch
+    if model.device.type == 'cuda':
+        free, _ = torch.cuda.mem_get_info(model.device)
+        return free
+    return psutil.virtual_memory().available
+
+
+def tune_batch_size(model, texts, max_batch_size=None):
+    """Probes increasing batch sizes on ``texts`` and returns the fastest one that is safe.
+
+    Probing stops at the first size that runs out of memory (or comes close to it), and
+    once two sizes in a row fail to beat the best one by ``MIN_SPEEDUP``. Returns a dict
+    with ``batch_size``, ``sentences_per_sec`` and the probed ``candidates``.
+    """
+    import torch
+
+    texts = [text for text in texts if text] or ["sample text"]
+    best_size, best_speed = CANDIDATE_BATCH_SIZES[0], 0.0
+    candidates = []
+    misses = 0
+    for batch_size in CANDIDATE_BATCH_SIZES:
+        if max_batch_size and batch_size > max_batch_size:
+            break
+        available = free_memory(model)
+        try:
+            speed, used = probe(model, texts, batch_size)
+        except (RuntimeError, MemoryError) as e:
+            if not is_out_of_memory(e):
+                raise
+            # Back off: keep the best size that fit.
+            if model.device.type == 'cuda':
+                torch.cuda.empty_cache()
+            candidates.append({"batch_size": batch_size, "out_of_memory": True})
+            break
+        candidates.append({"batch_size": batch_size, "sentences_per_sec": speed, "memory_mb": used / 1024**2})
+        if used > available * MEMORY_HEADROOM:
+            break
+
+        if speed > best_speed * MIN_SPEEDUP:
+            best_size, best_speed = batch_size, speed
+            misses = 0
+        else:
+            misses += 1
+            if misses == 2:
+                break
+    return {"batch_size": best_size, "sentences_per_sec": best_speed, "candidates": candidates}
+
+
+def auto_batch_size(model, model_name, device, texts, path=TUNING_FILE):
+    """Returns the tuned batch size for (model, device), tuning and saving it on first use."""
+    batch_size = load_batch_size(model_name, device, path)
+    if batch_size:
+        return batch_size
+    result = tune_batch_size(model, texts)
+    save_batch_size(model_name, device, result, path)
+    return result["batch_size"]
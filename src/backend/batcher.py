@@ -0,0 +1,268 @@
+import time
+import bisect
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 10
+LATENCY_WINDOW = 1000
+# Upper bounds of the histogram buckets; the last bucket counts everything slower.
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+class LatencyStats:
+    """Keeps the last ``window`` samples (in seconds) and summarises them in milliseconds."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+    def summary(self):
+        with self.lock:
+            samples = np.array(self.samples) * 1000
+            count = self.count
+        if not len(samples):
+            return {"count": count}
+        return {
+            "count": count,
+            "mean_ms": float(samples.mean()),
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p95_ms": float(np.percentile(samples, 95)),
+            "p99_ms": float(np.percentile(samples, 99)),
+            "max_ms": float(samples.max()),
+        }
+
+
+class Histogram:
+    """Counts samples (in seconds) per millisecond bucket, over the whole lifetime."""
+
+    def __init__(self, buckets_ms=HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        index = bisect.bisect_left(self.buckets_ms, seconds * 1000)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += seconds
+
+    def summary(self):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.total
+        count = sum(counts)
+        labels = [f"{bound:g}" for bound in self.buckets_ms] + ["inf"]
+        return {
+            "count": count,
+            "mean_ms": total * 1000 / count if count else 0.0,
+            "buckets_ms": dict(zip(labels, counts)),
+        }
+
+
+class BatchQueue:
+    """Waiting requests and batch statistics shared by MicroBatcher and AsyncMicroBatcher.
+
+    A batch is due as soon as ``max_batch_size`` texts are waiting, or once the oldest
+    waiting request has waited ``max_wait_ms``. Requests are never split, so a single
+    request larger than the cap runs as a batch of its own.
+    """
+
+    def __init__(self, encode, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.pending = deque()
+        self.pending_texts = 0
+        self.closed = False
+        self.batches = 0
+        self.batched_texts = 0
+        self.request_latency = LatencyStats()
+        self.batch_latency = LatencyStats()
+        # Where the time goes: waiting for a batch to start vs the model running it.
+        self.queue_wait = Histogram()
+        self.compute_time = Histogram()
+
+    def stats(self):
+        return {
+            "queue_depth": len(self.pending),
+            "queued_texts": self.pending_texts,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_texts / self.batches if self.batches else 0,
+            "request_latency": self.request_latency.summary(),
+            "batch_latency": self.batch_latency.summary(),
+            "queue_wait": self.queue_wait.summary(),
+            "compute_time": self.compute_time.summary(),
+        }
+
+    def _add(self, texts, future):
+        if self.closed:
+            raise RuntimeError("The batcher is closed")
+        self.pending.append((list(texts), future, time.perf_counter()))
+        self.pending_texts += len(texts)
+
+    def _wait_time(self):
+        # Seconds until the next batch is due: 0 for now, None while nothing is waiting.
+        if not self.pending:
+            return None
+        if self.pending_texts >= self.max_batch_size or self.closed:
+            return 0
+        return max(self.pending[0][2] + self.max_wait - time.perf_counter(), 0)
+
+    def _take_batch(self):
+        batch = [self.pending.popleft()]
+        size = len(batch[0][0])
+        while self.pending and size + len(self.pending[0][0]) <= self.max_batch_size:
+            request = self.pending.popleft()
+            batch.append(request)
+            size += len(request[0])
+        self.pending_texts -= size
+        return batch
+
+    def _record(self, batch, started, finished):
+        self.batches += 1
+        self.batched_texts += sum(len(texts) for texts, _, _ in batch)
+        self.batch_latency.add(finished - started)
+        self.compute_time.add(finished - started)
+        for _, _, submitted in batch:
+            self.queue_wait.add(started - submitted)
+            self.request_latency.add(finished - submitted)
+
+    def _resolve(self, batch, vectors=None, error=None):
+        offset = 0
+        for texts, future, _ in batch:
+            # Callers may have given up (cancelled) while their batch was running.
+            if not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(vectors[offset:offset + len(texts)])
+            offset += len(texts)
+
+
+class MicroBatcher(BatchQueue):
+    """Coalesces concurrent encode requests from many threads into batches.
+
+    ``submit`` returns a Future that resolves to that request's rows of its batch's
+    vectors. Batches are encoded one at a time on a worker thread.
+    """
+
+    def __init__(self, encode, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        super().__init__(encode, max_batch_size, max_wait_ms)
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, texts):
+        future = Future()
+        with self.condition:
+            self._add(texts, future)
+            self.condition.notify()
+        return future
+
+    def stats(self):
+        with self.condition:
+            return super().stats()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+    def _next_batch(self):
+        with self.condition:
+            while True:
+                wait = self._wait_time()
+                if wait == 0:
+                    return self._take_batch()
+                if wait is None and self.closed:
+                    return None
+                self.condition.wait(wait)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                vectors = self.encode([text for texts, _, _ in batch for text in texts])
+            except Exception as e:
+                self._resolve(batch, error=e)
+                continue
+            with self.condition:
+                self._record(batch, started, time.perf_counter())
+            self._resolve(batch, vectors)
+
+
+class AsyncMicroBatcher(BatchQueue):
+    """The asyncio counterpart of MicroBatcher: ``await batcher.embed(texts)``.
+
+    Batches are formed on the event loop, and each one is encoded on a single worker
+    thread, so the loop keeps accepting requests (which form the next batch) while the
+    model runs. A batcher belongs to the event loop it is first used from.
+    """
+
+    def __init__(self, encode, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        super().__init__(encode, max_batch_size, max_wait_ms)
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='micro-batcher')
+        self.wakeup = None
+        self.task = None
+
+    async def embed(self, texts):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._add(texts, future)
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = loop.create_task(self._run())
+        self.wakeup.set()
+        return await future
+
+    async def close(self):
+        self.closed = True
+        if self.task is not None:
+            self.wakeup.set()
+            await self.task
+        self.executor.shutdown(wait=True)
+
+    async def _next_batch(self):
+        while True:
+            wait = self._wait_time()
+            if wait == 0:
+                return self._take_batch()
+            if wait is None and self.closed:
+                return None
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(
+                    self.executor, self.encode, [text for texts, _, _ in batch for text in texts])
+            except Exception as e:
+                self._resolve(batch, error=e)
+                continue
+            self._record(batch, started, time.perf_counter())
+            self._resolve(batch, vectors)
@@ -0,0 +1,198 @@
+import os
+import csv
+import json
+import time
+import random
+import platform
+import threading
+
+import numpy as np
+import psutil
+
+from backend import readers
+from backend.registry import registry
+from backend.onnx_backend import INFERENCE_BACKENDS, load_onnx_model
+
+BENCHMARK_FILE = 'benchmark_results.json'
+WARM_UP_BATCHES = 2
+RSS_SAMPLE_INTERVAL = 0.05
+REPORT_FIELDS = [
+    'model_name', 'backend', 'device', 'threads', 'batch_size', 'sentences', 'sentences_per_sec',
+    'p50_latency_ms', 'p95_latency_ms', 'peak_rss_mb', 'load_time',
+]
+
+SYNTHETIC_WORDS = (
+    "the a of to and in is for on with as by at from that this it be are was data model search vector "
+    "text document query result embedding language system user file time value table index score "
+    "fast small large new first last best simple open local remote order price report customer product"
+).split()
+
+
+def synthetic_corpus(count, seed=0):
+    """Sentences of 8 to 40 common words, so batches vary in length like real input."""
+    generator = random.Random(seed)
+    return [" ".join(generator.choices(SYNTHETIC_WORDS, k=generator.randint(8, 40))) for _ in range(count)]
+
+
+def sample_corpus(file_path, count, seed=0):
+    # Reservoir sampling: an even sample of the whole file in a single pass.
+    generator = random.Random(seed)
+    sample = []
+    for row, text in enumerate(readers.iter_texts(file_path)):
+        if row < count:
+            sample.append(text)
+        else:
+            slot = generator.randint(0, row)
+            if slot < count:
+                sample[slot] = text
+    return sample
+
+
+class PeakMemory:
+    """Samples the RSS of this process in the background while the block runs."""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.start = 0
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @property
+    def peak_mb(self):
+        return self.peak / 1024**2
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            if self.stopped.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self.start = self.peak = self.process.memory_info().rss
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def benchmark_model(model, texts, batch_size):
+    """Encodes ``texts`` batch by batch and times every batch (after a short warm-up)."""
+    batches = list(readers.iter_batches(texts, batch_size))
+    for batch in batches[:WARM_UP_BATCHES]:
+        model.encode(batch, batch_size=batch_size)
+
+    latencies = []
+    start_time = time.perf_counter()
+    for batch in batches:
+        batch_start = time.perf_counter()
+        model.encode(batch, batch_size=batch_size)
+        latencies.append(time.perf_counter() - batch_start)
+    total_time = time.perf_counter() - start_time
+
+    return {
+        "sentences": len(texts),
+        "sentences_per_sec": len(texts) / total_time if total_time > 0 else 0,
+        "p50_latency_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_latency_ms": float(np.percentile(latencies, 95)) * 1000,
+    }
+
+
+def run_benchmarks(models, texts, batch_sizes, threads=None, devices=None, on_result=None, on_error=None,
+                   backends=None):
+    """Benchmarks every model on every device, backend, thread count and batch size.
+
+    Models are loaded through the shared registry, one at a time. A model that fails to
+    load (or to export to ONNX) is reported to ``on_error`` and skipped, so one bad name
+    doesn't end the run. ONNX backends only run on the CPU.
+    """
+    import torch
+
+    original_threads = torch.get_num_threads()
+    results = []
+    try:
+        for device in devices or ['cpu']:
+            for model_name in models:
+                try:
+                    model, load_time = registry.get(model_name, device)
+                except Exception as e:
+                    if on_error:
+                        on_error(f"Could not load {model_name} on {device}: {e}")
+                    continue
+                for backend in backends or ['torch']:
+                    if backend not in INFERENCE_BACKENDS:
+                        raise ValueError(f"Unsupported inference backend: {backend}")
+                    if backend != 'torch' and device != 'cpu':
+                        continue
+                    for thread_count in threads or [original_threads]:
+                        torch.set_num_threads(thread_count)
+                        runner = model
+                        if backend != 'torch':
+                            # ONNX Runtime sizes its thread pool per session.
+                            try:
+                                runner = load_onnx_model(model, model_name, backend, thread_count)
+                            except Exception as e:
+                                if on_error:
+                                    on_error(f"Could not run {model_name} with {INFERENCE_BACKENDS[backend]}: {e}")
+                                break
+                        for batch_size in batch_sizes:
+                            with PeakMemory() as memory:
+                                stats = benchmark_model(runner, texts, batch_size)
+                            result = {
+                                "model_name": model_name,
+                                "backend": backend,
+                                "device": device,
+                                "threads": thread_count,
+                                "batch_size": batch_size,
+                                **stats,
+                                "peak_rss_mb": memory.peak_mb,
+                                "load_time": load_time,
+                            }
+                            results.append(result)
+                            if on_result:
+                                on_result(result)
+    finally:
+        torch.set_num_threads(original_threads)
+    return results
+
+
+def write_report(results, path):
+    """Writes the results as CSV for a .csv path and as JSON (with machine info) otherwise."""
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(results)
+        return
+
+    report = {
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "memory_mb": psutil.virtual_memory().total / 1024**2,
+        },
+        "results": results,
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def measured_speeds(path=BENCHMARK_FILE):
+    """Returns the best sentences/sec measured per model in a JSON report, if there is one."""
+    try:
+        with open(path) as f:
+            results = json.load(f)["results"]
+    except (OSError, ValueError, KeyError):
+        return {}
+    speeds = {}
+    for result in results:
+        model_name = result["model_name"]
+        speeds[model_name] = max(speeds.get(model_name, 0), result["sentences_per_sec"])
+    return speeds
@@ -0,0 +1,130 @@
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+import numpy as np
+
+CACHE_FILE = '.embeddium_cache.sqlite'
+# SQLite caps the number of bound parameters per statement (999 on older builds).
+QUERY_CHUNK_SIZE = 500
+
+
+def normalize_text(text):
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def text_key(text):
+    # Texts that only differ in Unicode composition or runs of whitespace tokenize the
+    # same, so they share a key (and a vector).
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """Persistent (model, text hash) -> vector store with least-recently-used eviction.
+
+    Lookups and inserts come from different threads of the pipeline, so every access to
+    the connection goes through ``lock``.
+    """
+
+    def __init__(self, path, max_size_mb=1024):
+        self.path = path
+        self.max_size = int(max_size_mb * 1024**2)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, key BLOB NOT NULL, vector BLOB NOT NULL, last_used INTEGER NOT NULL, "
+            "PRIMARY KEY (model, key)) WITHOUT ROWID"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+
+        self.size, clock = self.connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0), COALESCE(MAX(last_used), 0) FROM embeddings"
+        ).fetchone()
+        self.clock = clock
+
+    def get_many(self, model_name, keys):
+        with self.lock:
+            return self._get_many(model_name, keys)
+
+    def put_many(self, model_name, keys, vectors):
+        with self.lock:
+            self._put_many(model_name, keys, vectors)
+
+    def _get_many(self, model_name, keys):
+        found = {}
+        for i in range(0, len(keys), QUERY_CHUNK_SIZE):
+            chunk = list(set(keys[i:i + QUERY_CHUNK_SIZE]))
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                [model_name, *chunk]
+            )
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+
+        if found:
+            self.clock += 1
+            self.connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                [(self.clock, model_name, key) for key in found]
+            )
+            self.connection.commit()
+
+        vectors = [found.get(key) for key in keys]
+        hit_count = sum(vector is not None for vector in vectors)
+        self.hits += hit_count
+        self.misses += len(vectors) - hit_count
+        return vectors
+
+    def _put_many(self, model_name, keys, vectors):
+        self.clock += 1
+        rows = [
+            (model_name, key, np.ascontiguousarray(vector, dtype=np.float32).tobytes(), self.clock)
+            for key, vector in zip(keys, vectors)
+        ]
+        with self.connection:
+            for row in rows:
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO embeddings (model, key, vector, last_used) VALUES (?, ?, ?, ?)", row
+                )
+                if cursor.rowcount:
+                    self.size += len(row[2])
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        # Trim to 90% of the limit so a full cache doesn't evict on every insert.
+        target = self.max_size * 0.9
+        with self.connection:
+            while self.size > target:
+                victims = self.connection.execute(
+                    "SELECT model, key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT ?",
+                    (QUERY_CHUNK_SIZE,)
+                ).fetchall()
+                if not victims:
+                    self.size = 0
+                    break
+                self.connection.executemany(
+                    "DELETE FROM embeddings WHERE model = ? AND key = ?",
+                    [(model, key) for model, key, _ in victims]
+                )
+                self.size -= sum(length for _, _, length in victims)
+
+    def stats(self):
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_size": self.size / 1024**2,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,119 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+
+MANIFEST_FILE = 'manifest.json'
+EMBEDDINGS_FILE = 'embeddings.npy'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Hashes by file version, so a file hashed ahead of time (see JobQueue) isn't read again.
+_file_hashes = {}
+
+
+def hash_file(file_path):
+    if isinstance(file_path, (list, tuple)):
+        return hashlib.sha256(''.join(hash_file(path) for path in file_path).encode('ascii')).hexdigest()
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        _file_hashes[key] = _hash_file(file_path)
+    return _file_hashes[key]
+
+
+def _hash_file(file_path):
+    # A fingerprint rather than a hash of the whole file, which would be a full read of
+    # the input before the first batch: the size and modification time catch any edit
+    # made in place, and the head and tail catch a different file copied over it.
+    stat = os.stat(file_path)
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}:".encode('ascii'))
+    with open(file_path, 'rb') as file:
+        digest.update(file.read(HASH_BLOCK_SIZE))
+        if stat.st_size > HASH_BLOCK_SIZE:
+            file.seek(max(stat.st_size - HASH_BLOCK_SIZE, HASH_BLOCK_SIZE))
+            digest.update(file.read(HASH_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+class EmbeddingCheckpoint:
+    """On-disk state of an embedding job that can be picked up again after a crash or cancel.
+
+    The embeddings buffer lives in a memmapped .npy next to a JSON manifest describing the
+    job. Rows below ``committed_rows`` were flushed to disk before the manifest recorded
+    them, so a rerun of the same job only has to encode the rows after that point.
+    """
+
+    def __init__(self, output_directory, output_name, output_format):
+        self.directory = os.path.join(output_directory, f".{output_name}.{output_format}.partial")
+        self.manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        self.embeddings_path = os.path.join(self.directory, EMBEDDINGS_FILE)
+        self.manifest = None
+        self.embeddings = None
+
+    @property
+    def committed_rows(self):
+        return self.manifest['committed_rows'] if self.manifest else 0
+
+    def open(self, job, total_rows, embedding_dim):
+        manifest = self._load_manifest()
+        if manifest is not None and manifest['job'] == job and os.path.exists(self.embeddings_path):
+            embeddings = np.lib.format.open_memmap(self.embeddings_path, mode='r+')
+            if embeddings.shape[1] == embedding_dim:
+                self.manifest = manifest
+                self.embeddings = embeddings
+                return embeddings
+
+        # Anything left over belongs to a different job (or is unreadable); start clean.
+        self.remove()
+        os.makedirs(self.directory, exist_ok=True)
+        self.embeddings = np.lib.format.open_memmap(
+            self.embeddings_path, mode='w+', dtype=np.float32, shape=(total_rows, embedding_dim))
+        self.manifest = {'job': job, 'committed_rows': 0, 'committed_batches': 0, 'error_count': 0}
+        self._write_manifest()
+        return self.embeddings
+
+    def grow(self, min_rows):
+        old_embeddings = self.embeddings
+        new_rows = max(min_rows, len(old_embeddings) * 2)
+        grown_path = self.embeddings_path + '.grow'
+        grown = np.lib.format.open_memmap(grown_path, mode='w+', dtype=old_embeddings.dtype,
+                                          shape=(new_rows, old_embeddings.shape[1]))
+        grown[:len(old_embeddings)] = old_embeddings
+        grown.flush()
+        del old_embeddings, grown
+        self.embeddings = None
+        os.replace(grown_path, self.embeddings_path)
+        self.embeddings = np.lib.format.open_memmap(self.embeddings_path, mode='r+')
+        return self.embeddings
+
+    def commit(self, committed_rows, committed_batches, error_count):
+        self.embeddings.flush()
+        self.manifest.update({
+            'committed_rows': committed_rows,
+            'committed_batches': committed_batches,
+            'error_count': error_count,
+        })
+        self._write_manifest()
+
+    def close(self):
+        self.embeddings = None
+
+    def remove(self):
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self):
+        # Write-then-rename so a crash mid-write never leaves a truncated manifest behind.
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.manifest, file, indent=2)
+        os.replace(temp_path, self.manifest_path)
@@ -2,12 +2,14 @@
 
 from PyQt5.QtCore import pyqtSignal, QThread
 
+from backend.job_queue import JobQueue
+
 class EmbeddingWorker(QThread):
     progress_updated = pyqtSignal(dict)
     embedding_completed = pyqtSignal(str, dict)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, backend, input_file, output_dir, model, output_name, output_format, batch_size):
+    def __init__(self, backend, input_file, output_dir, model, output_name, output_format, batch_size, **options):
         super().__init__()
         self.backend = backend
         self.input_file = input_file
@@ -16,6 +18,13 @@ class EmbeddingWorker(QThread):
         self.output_name = output_name
         self.output_format = output_format
         self.batch_size = batch_size
+        # Passed straight on to embed_file (devices, max_batch_tokens, index_type, ...).
+        self.options = options
+        # The backend is shared by every run; only a cancel of this run may stop it.
+        self.backend.cancel_flag = False
+
+    def cancel(self):
+        self.backend.cancel_embedding()
 
     def run(self):
         try:
@@ -24,7 +33,8 @@ class EmbeddingWorker(QThread):
             self.backend.embedding_completed.connect(self.embedding_completed.emit)
             self.backend.error_occurred.connect(self.error_occurred.emit)
             
-            self.backend.embed_file(self.input_file, self.output_dir, self.model, self.output_name, self.output_format, self.batch_size)
+            self.backend.embed_file(self.input_file, self.output_dir, self.model, self.output_name, self.output_format, self.batch_size,
+                                    **self.options)
         except Exception as e:
             self.error_occurred.emit(str(e))
         finally:
@@ -40,4 +50,29 @@ class EmbeddingWorker(QThread):
             try:
                 self.backend.error_occurred.disconnect(self.error_occurred.emit)
             except TypeError:
-                pass
\ No newline at end of file
+                pass
+
+
+class EmbeddingQueueWorker(QThread):
+    """Runs a JobQueue over several input files (or directories) in the background."""
+    progress_updated = pyqtSignal(dict)
+    job_finished = pyqtSignal(dict)
+    embedding_completed = pyqtSignal(str, dict)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, input_paths, output_dir, model, output_name, output_format, batch_size, combine=False,
+                 **options):
+        super().__init__()
+        self.queue = JobQueue(input_paths, output_dir, model, output_name, output_format, batch_size, combine,
+                              on_progress=self.progress_updated.emit, on_job_finished=self.job_finished.emit,
+                              on_completed=self.embedding_completed.emit, on_error=self.error_occurred.emit,
+                              **options)
+
+    def cancel(self):
+        self.queue.cancel()
+
+    def run(self):
+        try:
+            self.queue.run()
+        except Exception as e:
+            self.error_occurred.emit(str(e))
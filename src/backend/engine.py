@@ -0,0 +1,511 @@
+import os
+import copy
+import json
+import time
+from itertools import islice, compress
+
+import numpy as np
+import psutil
+
+from backend import readers, faiss_index, quantize, shards, incremental, autotune, inputs
+from backend.incremental import ExistingOutput
+from backend.checkpoint import EmbeddingCheckpoint, hash_file
+from backend.cache import EmbeddingCache, CACHE_FILE
+from backend.scheduler import BatchScheduler
+from backend.pool import EncoderPool, LocalEncoder
+from backend.onnx_backend import INFERENCE_BACKENDS, OnnxEncoder, load_onnx_model
+from backend.pipeline import AsyncWriter, Prefetcher
+from backend.writers import HDF5Writer, HDF5_COMPRESSIONS, text_hashes
+from backend.registry import registry
+
+# Throughout the backend, heavy and optional dependencies (torch, sentence-transformers,
+# faiss, h5py, pandas, openpyxl, chardet, onnx, onnxruntime) are imported inside the
+# functions that use them, so importing a backend module, as the GUI and the CLI do at
+# startup, stays cheap.
+
+
+class EmbeddingEngine:
+    """The read/encode/save pipeline without any Qt dependency.
+
+    Progress, completion and errors are reported through the optional callbacks (or by
+    overriding the ``report_*`` methods, as the Qt backend does).
+
+    ``embed_file`` never clears ``cancel_flag`` itself, so a cancel that comes in before a
+    run has started still stops it. An engine that is reused after a cancel has to be
+    reset by its owner.
+    """
+
+    def __init__(self, on_progress=None, on_completed=None, on_error=None):
+        self.on_progress = on_progress
+        self.on_completed = on_completed
+        self.on_error = on_error
+        self.supported_input_formats = readers.SUPPORTED_INPUT_FORMATS
+        self.supported_output_formats = ['pt', 'npy', 'hdf5', 'faiss']
+        self.cancel_flag = False
+        self.checkpoint_interval = 30
+        self.cache_size_mb = 1024
+        self.registry = registry
+        self.preload_models = True
+
+    def report_progress(self, stats):
+        if self.on_progress:
+            self.on_progress(stats)
+
+    def report_completed(self, output_file_path, stats):
+        if self.on_completed:
+            self.on_completed(output_file_path, stats)
+
+    def report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+
+    def cancel_embedding(self):
+        self.cancel_flag = True
+
+    def preload_model(self, model_name, device=None):
+        if self.preload_models:
+            self.registry.preload(model_name, device)
+
+    def detect_encoding(self, file_path):
+        return readers.detect_encoding(file_path)
+
+    def iter_texts(self, file_path, columns=None, separator=' ', header=False, row_counts=None):
+        return readers.iter_texts(file_path, columns, separator, header, row_counts)
+
+    def read_file(self, file_path, columns=None, separator=' ', header=False):
+        return list(self.iter_texts(file_path, columns, separator, header))
+
+    def save_embeddings(self, embeddings, output_path, output_format, index_type='flat', metric='l2',
+                        precision='float32', compression=None, texts=None, info=None, row_offset=0):
+        # Every writer works straight off the (preallocated) numpy buffer, converting it
+        # chunk by chunk, so saving never materialises a second float32 copy of the matrix.
+        if not isinstance(embeddings, np.ndarray):
+            embeddings = embeddings.cpu().numpy()
+        metadata = quantize.calibrate(embeddings, precision)
+        storage_dtype = quantize.STORAGE_DTYPES[precision]
+        shape = quantize.output_shape(embeddings.shape, precision)
+
+        if output_format == 'pt':
+            import torch
+            if precision == 'float32':
+                # Saved straight from the buffer; only reduced precisions need a converted copy.
+                data = torch.from_numpy(np.ascontiguousarray(embeddings))
+            else:
+                data = torch.from_numpy(quantize.quantize_all(embeddings, metadata))
+            if precision == 'bfloat16':
+                data = data.view(torch.bfloat16)
+            if precision in ('int8', 'binary'):
+                # The codes alone can't be turned back into vectors.
+                data = {"embeddings": data, **metadata}
+            torch.save(data, output_path)
+        elif output_format == 'npy':
+            output = np.lib.format.open_memmap(output_path, mode='w+', dtype=storage_dtype, shape=shape)
+            for start in range(0, len(embeddings), quantize.CHUNK_SIZE):
+                output[start:start + quantize.CHUNK_SIZE] = quantize.quantize(
+                    embeddings[start:start + quantize.CHUNK_SIZE], metadata)
+            output.flush()
+            del output
+            if precision != 'float32':
+                # .npy has no room for metadata, so it goes next to the file.
+                with open(output_path + '.json', 'w') as f:
+                    json.dump(metadata, f)
+        elif output_format == 'hdf5':
+            # The dataset is appended to chunk by chunk, but only from the finished buffer:
+            # batches finish out of row order (length sorting, duplicates, resumed rows) and
+            # int8 is calibrated on every row, so nothing is written while the job encodes.
+            # texts (the input rows, in order) are only read to store their hashes.
+            text_chunks = readers.iter_batches(texts, quantize.CHUNK_SIZE) if texts is not None else None
+            writer = HDF5Writer(output_path, shape[1], storage_dtype, compression, info, metadata, len(embeddings))
+            try:
+                for start in range(0, len(embeddings), quantize.CHUNK_SIZE):
+                    chunk = embeddings[start:start + quantize.CHUNK_SIZE]
+                    hashes = text_hashes(next(text_chunks)) if text_chunks else None
+                    row_ids = np.arange(row_offset + start, row_offset + start + len(chunk))
+                    writer.append(quantize.quantize(chunk, metadata), row_ids, hashes)
+            finally:
+                writer.close()
+        elif output_format == 'faiss':
+            if precision != 'float32':
+                raise ValueError("FAISS indexes are always built from float32 vectors")
+            faiss_index.write_index(embeddings, output_path, index_type, metric)
+        else:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+    def save_shards(self, embeddings, output_directory, output_name, output_format, shard_rows,
+                    index_type='flat', metric='l2', precision='float32', compression=None, texts=None, info=None):
+        """Saves ``embeddings`` as numbered shards of ``shard_rows`` rows plus a JSON manifest.
+
+        Every shard is a complete file of ``output_format`` (int8 shards are calibrated on
+        their own rows), so they can be loaded or searched independently and in parallel.
+        Shards are cut from the finished buffer once every row has been encoded, not
+        streamed out while the job runs; sharding bounds the size of each output file, not
+        the memory the job needs.
+        """
+        total_rows, embedding_dim = embeddings.shape
+        manifest = {
+            **(info or {}),
+            "embedding_dim": embedding_dim,
+            "format": output_format,
+            "precision": precision,
+            "dtype": shards.storage_dtype(precision) if output_format != 'faiss' else 'float32',
+            "shape": list(quantize.output_shape(embeddings.shape, precision)),
+            "total_rows": total_rows,
+            "shard_rows": shard_rows,
+            "shards": [],
+        }
+        if output_format == 'faiss':
+            manifest["index_type"] = index_type
+            manifest["metric"] = metric
+
+        for shard_index, (start, stop) in enumerate(shards.shard_ranges(total_rows, shard_rows)):
+            file_name = shards.shard_file_name(output_name, shard_index, output_format)
+            shard_path = os.path.join(output_directory, file_name)
+            shard_texts = islice(texts, stop - start) if texts is not None else None
+            self.save_embeddings(embeddings[start:stop], shard_path, output_format, index_type, metric,
+                                 precision, compression, shard_texts, info, row_offset=start)
+            manifest["shards"].append({
+                "file": file_name,
+                "start": start,
+                "stop": stop,
+                "size": os.path.getsize(shard_path),
+            })
+
+        path = shards.manifest_path(output_directory, output_name)
+        shards.write_manifest(path, manifest)
+        return path, manifest
+
+    def embed_file(self, input_file_path, output_directory, model_name, output_name, output_format, batch_size,
+                   resume=True, use_cache=True, deduplicate=True, sort_by_length=True, max_batch_tokens=None,
+                   device=None, devices=None, columns=None, separator=' ', header=False,
+                   index_type='flat', metric='l2', precision='float32', compression=None,
+                   shard_rows=None, shard_size_mb=None, append=False, inference_backend='torch'):
+        output_format = output_format.lstrip('.')
+        if output_format not in self.supported_output_formats:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        if index_type not in faiss_index.FAISS_INDEX_TYPES:
+            raise ValueError(f"Unsupported FAISS index type: {index_type}")
+        if metric not in faiss_index.FAISS_METRICS:
+            raise ValueError(f"Unsupported FAISS metric: {metric}")
+        if precision not in quantize.PRECISIONS:
+            raise ValueError(f"Unsupported precision: {precision}")
+        if output_format == 'faiss' and precision != 'float32':
+            raise ValueError("FAISS indexes are always built from float32 vectors")
+        if compression not in HDF5_COMPRESSIONS:
+            raise ValueError(f"Unsupported HDF5 compression: {compression}")
+        if (shard_rows is not None and shard_rows <= 0) or (shard_size_mb is not None and shard_size_mb <= 0):
+            raise ValueError("Shard limits must be positive")
+        sharded = bool(shard_rows or shard_size_mb)
+        if append and sharded:
+            raise ValueError("Append mode doesn't support sharded outputs")
+        if batch_size != 'auto' and (not isinstance(batch_size, int) or batch_size <= 0):
+            raise ValueError(f"Unsupported batch size: {batch_size}")
+        if inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unsupported inference backend: {inference_backend}")
+        if inference_backend != 'torch' and any(d != 'cpu' for d in [device or 'cpu'] + (devices or [])):
+            raise ValueError("The ONNX Runtime backend only runs on the CPU")
+
+        start_time = time.time()
+        process = psutil.Process(os.getpid())
+        peak_memory_usage = 0
+        checkpoint = None
+        cache = None
+        scheduler = None
+        encoder = None
+        reader = None
+        writer = None
+        embeddings = None
+        buffer = None
+        buffer_path = None
+        existing = None
+        items_processed = 0
+        batch_number = 0
+        error_count = 0
+
+        try:
+            if inference_backend != 'torch':
+                # One ONNX Runtime session already spreads a batch over all cores.
+                device, devices = 'cpu', None
+            if devices and len(devices) == 1:
+                device, devices = devices[0], None
+            # With a pool the workers load their own copies; the local one is only used
+            # for the embedding size and the tokenizer.
+            model, load_time = self.registry.get(model_name, 'cpu' if devices else device)
+            pool_start_time = time.time()
+            if devices:
+                encoder = EncoderPool(model_name, devices)
+            elif inference_backend != 'torch':
+                # Exported (and parity-checked) on first use, then loaded from disk.
+                encoder = OnnxEncoder(load_onnx_model(model, model_name, inference_backend))
+            else:
+                encoder = LocalEncoder(model)
+            load_time += time.time() - pool_start_time
+
+            total_items = readers.count_items(input_file_path, columns, separator, header)
+            if total_items == 0:
+                raise ValueError("No text found in the input file")
+
+            embedding_dim = model.get_sentence_embedding_dimension()
+            if batch_size == 'auto':
+                batch_size = self._auto_batch_size(model, model_name, device, devices, input_file_path,
+                                                   columns, separator, header, inference_backend)
+            if append:
+                existing = ExistingOutput.find(output_directory, output_name, output_format)
+                if existing and existing.precision != precision:
+                    raise ValueError(f"The existing output was saved with {existing.precision} precision")
+                new_hashes = incremental.input_hashes(self.iter_texts(input_file_path, columns, separator, header))
+            if existing:
+                # Only rows whose text isn't in the existing output are read and encoded.
+                plan = existing.plan(new_hashes)
+                total_items = int((plan < 0).sum())
+
+            # Rows of a failed batch stay zero so the output stays aligned with the input.
+            if resume and not existing:
+                checkpoint = EmbeddingCheckpoint(output_directory, output_name, output_format)
+                job = {
+                    "input_hash": hash_file(input_file_path),
+                    "model_name": model_name,
+                    "inference_backend": inference_backend,
+                    "batch_size": batch_size,
+                    "output_format": output_format,
+                    "columns": columns,
+                    "separator": separator,
+                    "header": header,
+                }
+                embeddings = checkpoint.open(job, total_items, embedding_dim)
+                items_processed = checkpoint.committed_rows
+                batch_number = checkpoint.manifest['committed_batches']
+                error_count = checkpoint.manifest['error_count']
+            elif output_format == 'npy' and precision == 'float32' and not sharded and not existing:
+                # Batches are written straight into a memmap of the final .npy file.
+                buffer_path = os.path.join(output_directory, f".{output_name}.npy.tmp")
+                embeddings = np.lib.format.open_memmap(buffer_path, mode='w+', dtype=np.float32,
+                                                       shape=(total_items, embedding_dim))
+            else:
+                embeddings = np.zeros((total_items, embedding_dim), dtype=np.float32)
+
+            if use_cache:
+                cache = EmbeddingCache(os.path.join(output_directory, CACHE_FILE), self.cache_size_mb)
+
+            resumed_items = items_processed
+            last_checkpoint_time = time.time()
+            # The backends' vectors differ slightly (and int8 ones more than that), so each
+            # one gets its own namespace in the cache.
+            cache_namespace = f"{model_name}@{inference_backend}"
+
+            # Reading, scheduling (this thread), tokenizing, encoding and writing run as
+            # separate stages connected by bounded queues, so they overlap.
+            # A list of input files is embedded into one output; the rows of every file
+            # are counted as they are read, for the file index written next to it.
+            row_counts = [] if isinstance(input_file_path, (list, tuple)) else None
+            texts = self.iter_texts(input_file_path, columns, separator, header, row_counts)
+            texts = compress(texts, plan < 0) if existing else islice(texts, resumed_items, None)
+            reader = Prefetcher(texts, batch_size)
+            writer = AsyncWriter(embeddings, encoder.max_in_flight, cache, cache_namespace, checkpoint,
+                                 error_count, self.report_error)
+            length_function = self._token_length_function(model) if max_batch_tokens else None
+            scheduler = BatchScheduler(reader, batch_size, resumed_items, cache, cache_namespace, deduplicate,
+                                       sort_by_length, max_batch_tokens, length_function)
+            for batch in scheduler:
+                if self.cancel_flag:
+                    raise InterruptedError("Embedding process was cancelled")
+                writer.check()
+
+                if batch.texts is not None:
+                    batch_number += 1
+                    writer.write(batch_number, batch, encoder.submit(batch.texts))
+                else:
+                    writer.write(batch_number, batch)
+
+                items_processed = resumed_items + writer.rows_written
+                if checkpoint and time.time() - last_checkpoint_time >= self.checkpoint_interval:
+                    # Queued behind the batches it covers, so it only runs once they are written.
+                    writer.commit(scheduler.committed_rows, batch_number)
+                    last_checkpoint_time = time.time()
+
+                progress = min(items_processed / total_items * 100, 100)
+                elapsed_time = time.time() - start_time
+                speed = (items_processed - resumed_items) / elapsed_time if elapsed_time > 0 else 0
+                eta = max(total_items - items_processed, 0) / speed if speed > 0 else 0
+                
+                current_memory_usage = process.memory_info().rss / 1024**2
+                peak_memory_usage = max(peak_memory_usage, current_memory_usage)
+                
+                stats = {
+                    "progress": progress,
+                    "items_processed": items_processed,
+                    "total_items": total_items,
+                    "resumed_items": resumed_items,
+                    "speed": speed,
+                    "eta": eta,
+                    "error_count": writer.error_count,
+                    "memory_usage": current_memory_usage,
+                    "embedding_dim": embedding_dim,
+                    "model_name": model_name,
+                    "output_size": items_processed * quantize.vector_size(embedding_dim, precision) / 1024**2,
+                    "load_time": load_time,
+                    "encode_time": encoder.encode_time
+                }
+                stats.update(reader.stats())
+                stats.update(encoder.stats())
+                stats.update(writer.stats())
+                if cache:
+                    stats.update(cache.stats())
+                
+                self.report_progress(stats)
+
+            writer.close()
+            writer.check()
+            error_count = writer.error_count
+
+            if self.cancel_flag:
+                raise InterruptedError("Embedding process was cancelled")
+
+            # The item count was only an estimate (see readers.count_items); never save
+            # the unused tail of the buffer.
+            total_items = scheduler.rows_read
+            if total_items == 0 and not existing:
+                raise ValueError("No text found in the input file")
+            buffer, writer.embeddings, writer = writer.embeddings, None, None
+            embeddings = None
+
+            output_file_path = os.path.join(output_directory, f"{output_name}.{output_format}")
+            info = {
+                "model_name": model_name,
+                "embedding_dim": embedding_dim,
+                "input_file": (os.path.basename(input_file_path) if row_counts is None
+                               else f"{len(input_file_path)} files"),
+                "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+            texts = self.iter_texts(input_file_path, columns, separator, header) if output_format == 'hdf5' else None
+            if existing:
+                existing.update(buffer[:total_items], plan, new_hashes, info)
+                output_file_path = existing.path
+                output_size = os.path.getsize(output_file_path)
+                buffer = None
+            elif sharded:
+                output_file_path, manifest = self.save_shards(
+                    buffer[:total_items], output_directory, output_name, output_format,
+                    shards.rows_per_shard(embedding_dim, precision, shard_rows, shard_size_mb),
+                    index_type, metric, precision, compression, texts, info)
+                output_size = sum(shard["size"] for shard in manifest["shards"])
+                buffer = None
+            elif (output_format == 'npy' and precision == 'float32' and isinstance(buffer, np.memmap)
+                    and buffer.shape[0] == total_items):
+                # The buffer already is the finished .npy file, so it only has to be moved
+                # into place. Every mapping of it is closed first, which Windows insists on.
+                buffer.flush()
+                buffer_file = buffer.filename
+                buffer = None
+                if checkpoint:
+                    checkpoint.close()
+                os.replace(buffer_file, output_file_path)
+                output_size = os.path.getsize(output_file_path)
+            else:
+                self.save_embeddings(buffer[:total_items], output_file_path, output_format, index_type, metric,
+                                     precision, compression, texts, info)
+                output_size = os.path.getsize(output_file_path)
+                buffer = None
+            if append and not existing and output_format != 'hdf5':
+                # Kept so that the next append-mode run can tell which rows are new.
+                incremental.write_hashes(output_file_path, new_hashes)
+            if row_counts is not None:
+                file_index = inputs.write_file_index(output_file_path, input_file_path, row_counts)
+            if checkpoint:
+                checkpoint.remove()
+                checkpoint = None
+
+            embedded_items = total_items - resumed_items
+            if existing:
+                total_items = len(plan)
+            total_time = time.time() - start_time
+            final_stats = {
+                "progress": 100,
+                "items_processed": total_items,
+                "total_items": total_items,
+                "resumed_items": resumed_items,
+                "speed": embedded_items / total_time,
+                "eta": 0,
+                "error_count": error_count,
+                "memory_usage": peak_memory_usage,
+                "embedding_dim": embedding_dim,
+                "model_name": model_name,
+                "output_size": output_size / 1024**2,
+                "total_time": total_time,
+                "load_time": load_time,
+                "encode_time": encoder.encode_time,
+                "output_file": output_file_path,
+                "devices": encoder.devices if devices else [str(model.device)],
+                "precision": precision,
+                "batch_size": batch_size,
+                "inference_backend": inference_backend,
+            }
+            if row_counts is not None:
+                final_stats["file_index"] = file_index
+            if inference_backend != 'torch':
+                final_stats["onnx_parity"] = encoder.onnx_model.parity
+            if deduplicate:
+                final_stats["duplicate_items"] = scheduler.duplicate_rows
+                final_stats["dedup_ratio"] = scheduler.duplicate_rows / max(embedded_items, 1)
+            if existing:
+                final_stats["reused_items"] = total_items - embedded_items
+            if cache:
+                final_stats.update(cache.stats())
+            self.report_completed(output_file_path, final_stats)
+            return output_file_path, final_stats
+
+        except InterruptedError as e:
+            self.report_error(str(e))
+        except Exception as e:
+            self.report_error(f"An error occurred: {str(e)}")
+        finally:
+            if reader:
+                reader.close()
+            if writer:
+                # Batches that are still queued are dropped rather than waited for.
+                writer.cancel()
+            if encoder:
+                encoder.close()
+            if writer:
+                writer.close()
+                error_count = writer.error_count
+            # Whatever was encoded before a cancel or failure is kept for the next run.
+            if checkpoint and checkpoint.embeddings is not None:
+                committed_rows = items_processed
+                if scheduler:
+                    committed_rows = min([scheduler.committed_rows] + (writer.unwritten_rows if writer else []))
+                checkpoint.commit(committed_rows, batch_number, error_count)
+                checkpoint.close()
+            if buffer_path and os.path.exists(buffer_path):
+                # Without checkpoints there is nothing to resume, so the partial file goes
+                # (once nothing maps it any more, which Windows insists on).
+                del embeddings, buffer
+                if writer:
+                    writer.embeddings = None
+                os.remove(buffer_path)
+            if cache:
+                cache.close()
+
+    def _auto_batch_size(self, model, model_name, device, devices, input_file_path, columns, separator, header,
+                         inference_backend='torch'):
+        # A pool encodes on its own devices, so the size is tuned on (a copy on) the first one.
+        tune_device = devices[0] if devices else device
+        if tune_device and str(model.device) != str(tune_device):
+            model, _ = self.registry.get(model_name, tune_device)
+        device_name = str(model.device)
+        if inference_backend != 'torch':
+            model = load_onnx_model(model, model_name, inference_backend)
+            device_name = f"{device_name}/{inference_backend}"
+        sample = list(islice(self.iter_texts(input_file_path, columns, separator, header), autotune.SAMPLE_ROWS))
+        return autotune.auto_batch_size(model, model_name, device_name, sample)
+
+    def _token_length_function(self, model):
+        # The shared model's tokenizer may be in use on another thread (the encoder's, or
+        # the service's), and fast tokenizers can't be shared between threads.
+        tokenizer = copy.deepcopy(model.tokenizer)
+        max_length = model.max_seq_length
+
+        def token_lengths(texts):
+            encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+            return [len(ids) for ids in encoded['input_ids']]
+
+        return token_lengths
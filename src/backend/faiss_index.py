@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+
+FAISS_INDEX_TYPES = {
+    'flat': "Flat (exact search)",
+    'ivf_flat': "IVF-Flat",
+    'ivf_pq': "IVF-PQ (compressed)",
+    'hnsw': "HNSW (graph)",
+}
+FAISS_METRICS = {
+    'l2': "L2 distance",
+    'ip': "Inner product (normalized models)",
+}
+
+# Vectors are added (and converted to float32) this many at a time, so a memmapped
+# buffer is never copied into memory as a whole. The index is built once every row has
+# been encoded: IVF and PQ indexes have to be trained on a sample of all rows first.
+ADD_BATCH_SIZE = 65536
+# k-means needs about this many training points per centroid; FAISS warns below it.
+MIN_POINTS_PER_CENTROID = 39
+MAX_TRAINING_SAMPLE = 100000
+IVF_NPROBE = 16
+HNSW_NEIGHBORS = 32
+PQ_BITS = 8
+PQ_DIMS_PER_SUBQUANTIZER = 8
+
+
+def build_index(embeddings, index_type='flat', metric='l2'):
+    import faiss
+
+    if index_type not in FAISS_INDEX_TYPES:
+        raise ValueError(f"Unsupported FAISS index type: {index_type}")
+    if metric not in FAISS_METRICS:
+        raise ValueError(f"Unsupported FAISS metric: {metric}")
+
+    count, dim = embeddings.shape
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == 'ip' else faiss.METRIC_L2
+
+    if index_type == 'flat':
+        index = faiss.IndexFlat(dim, faiss_metric)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, HNSW_NEIGHBORS, faiss_metric)
+    else:
+        nlist = ivf_list_count(count)
+        quantizer = faiss.IndexFlat(dim, faiss_metric)
+        if index_type == 'ivf_flat':
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss_metric)
+            centroids = nlist
+        else:
+            bits = pq_bits(count)
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_subquantizers(dim), bits, faiss_metric)
+            centroids = max(nlist, 2 ** bits)
+        index.train(training_sample(embeddings, centroids * MIN_POINTS_PER_CENTROID))
+        index.nprobe = min(nlist, IVF_NPROBE)
+
+    for start in range(0, count, ADD_BATCH_SIZE):
+        index.add(np.ascontiguousarray(embeddings[start:start + ADD_BATCH_SIZE], dtype=np.float32))
+    return index
+
+
+def write_index(embeddings, output_path, index_type='flat', metric='l2'):
+    import faiss
+    faiss.write_index(build_index(embeddings, index_type, metric), output_path)
+
+
+def ivf_list_count(count):
+    # The usual rule of thumb is ~4*sqrt(n) lists, as long as each one can be trained.
+    return max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_CENTROID))
+
+
+def pq_subquantizers(dim):
+    # The largest divisor of dim that leaves at least PQ_DIMS_PER_SUBQUANTIZER dims each.
+    for subquantizers in range(max(1, dim // PQ_DIMS_PER_SUBQUANTIZER), 0, -1):
+        if dim % subquantizers == 0:
+            return subquantizers
+    return 1
+
+
+def pq_bits(count):
+    # Small inputs can't train 256 codes per subquantizer.
+    return max(1, min(PQ_BITS, int(math.log2(max(count // MIN_POINTS_PER_CENTROID, 2)))))
+
+
+def training_sample(embeddings, sample_size):
+    count = len(embeddings)
+    sample_size = min(count, sample_size, MAX_TRAINING_SAMPLE)
+    if sample_size == count:
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    # Sorted rows keep reads from a memmapped buffer sequential.
+    rows = np.sort(np.random.default_rng(0).choice(count, sample_size, replace=False))
+    return np.ascontiguousarray(embeddings[rows], dtype=np.float32)
@@ -0,0 +1,277 @@
+import io
+import os
+
+import numpy as np
+
+from backend import readers, faiss_index, quantize, loader
+from backend.writers import HDF5Writer, text_hashes, TEXT_HASH_SIZE
+
+HASHES_SUFFIX = '.hashes.npy'
+
+
+def input_hashes(texts):
+    chunks = [text_hashes(batch) for batch in readers.iter_batches(texts, quantize.CHUNK_SIZE)]
+    return np.concatenate(chunks) if chunks else np.empty((0, TEXT_HASH_SIZE), dtype=np.uint8)
+
+
+def write_hashes(output_path, hashes):
+    """Stores the row hashes of a pt/npy/faiss output next to it (.hdf5 keeps them inside)."""
+    np.save(output_path + HASHES_SUFFIX, hashes)
+
+
+def plan_rows(old_hashes, new_hashes):
+    """Returns, for every new row, the row of the old output with the same text or -1."""
+    plan = np.full(len(new_hashes), -1, dtype=np.int64)
+    if not len(old_hashes) or not len(new_hashes):
+        return plan
+    # The 16-byte hashes are compared as pairs of integers, sorted once and searched.
+    old_keys = _hash_keys(old_hashes)
+    new_keys = _hash_keys(new_hashes)
+    order = np.argsort(old_keys, kind='stable')
+    positions = np.searchsorted(old_keys[order], new_keys)
+    positions[positions == len(order)] = 0
+    found = old_keys[order[positions]] == new_keys
+    plan[found] = order[positions[found]]
+    return plan
+
+
+def _hash_keys(hashes):
+    halves = np.ascontiguousarray(hashes).view('<u8')
+    keys = np.empty(len(halves), dtype=[('high', '<u8'), ('low', '<u8')])
+    keys['high'] = halves[:, 0]
+    keys['low'] = halves[:, 1]
+    return keys
+
+
+class ExistingOutput:
+    """An output of an earlier run that an append-mode job updates instead of replacing.
+
+    Rows are matched on their text hashes (the ``text_hashes`` dataset of an .hdf5 file,
+    a ``.hashes.npy`` sidecar for the other formats), so only new or changed texts need
+    encoding. If the new input only adds rows at the end, the output is extended in
+    place: HDF5 datasets are resized, FAISS indexes get the new vectors added and .npy
+    files grow behind their header. Anything else (edited, removed or reordered rows)
+    rewrites the output from the stored vectors without re-encoding them. New int8 rows
+    reuse the output's calibration, so values outside its range are clipped.
+    """
+
+    def __init__(self, path, output_format):
+        self.path = path
+        self.output_format = output_format
+        self.hashes = self._read_hashes()
+        if output_format == 'faiss':
+            self.metadata = {"precision": 'float32'}
+        else:
+            self.metadata = loader.read_metadata(path)
+
+    @classmethod
+    def find(cls, output_directory, output_name, output_format):
+        path = os.path.join(output_directory, f"{output_name}.{output_format}")
+        return cls(path, output_format) if os.path.exists(path) else None
+
+    @property
+    def precision(self):
+        return self.metadata["precision"]
+
+    def _read_hashes(self):
+        if self.output_format == 'hdf5':
+            import h5py
+            with h5py.File(self.path, 'r') as f:
+                if 'text_hashes' in f:
+                    return f['text_hashes'][:]
+        elif os.path.exists(self.path + HASHES_SUFFIX):
+            return np.load(self.path + HASHES_SUFFIX)
+        raise ValueError(f"{os.path.basename(self.path)} has no row hashes to compare against; "
+                         "create it once with append mode on")
+
+    def plan(self, new_hashes):
+        return plan_rows(self.hashes, new_hashes)
+
+    def is_append(self, new_hashes):
+        # Compared on the hashes rather than the plan: a repeated text is planned onto the
+        # first row that stores it, so an input with duplicates never plans as 0..n-1.
+        old_rows = len(self.hashes)
+        return len(new_hashes) >= old_rows and np.array_equal(new_hashes[:old_rows], self.hashes)
+
+    def update(self, new_embeddings, plan, new_hashes, info=None):
+        """Writes the output for the new input; ``new_embeddings`` holds the rows planned as -1."""
+        if self.is_append(new_hashes):
+            if len(plan) > len(self.hashes):
+                getattr(self, f"_append_{self.output_format}")(new_embeddings, plan, new_hashes, info)
+        else:
+            getattr(self, f"_rewrite_{self.output_format}")(new_embeddings, plan, new_hashes, info)
+        if self.output_format != 'hdf5':
+            write_hashes(self.path, new_hashes)
+        self.hashes = new_hashes
+
+    def _stored_chunks(self, old, new_embeddings, plan):
+        # Old rows are copied as stored, new ones quantized with the output's calibration.
+        new_rows = np.cumsum(plan < 0) - 1
+        for start in range(0, len(plan), quantize.CHUNK_SIZE):
+            rows = plan[start:start + quantize.CHUNK_SIZE]
+            reused = rows >= 0
+            chunk = np.empty((len(rows),) + old.shape[1:], dtype=old.dtype)
+            chunk[reused] = _take_rows(old, rows[reused])
+            if not reused.all():
+                added = new_rows[start:start + quantize.CHUNK_SIZE][~reused]
+                chunk[~reused] = quantize.quantize(new_embeddings[added], self.metadata)
+            yield start, chunk
+
+    def _stored_tail(self, old, new_embeddings, plan):
+        # The rows after the old ones; repeats of stored texts are copied as stored.
+        tail = plan[len(self.hashes):]
+        for start, chunk in self._stored_chunks(old, new_embeddings, tail):
+            yield len(self.hashes) + start, chunk
+
+    def _append_npy(self, new_embeddings, plan, new_hashes, info):
+        old = loader.open_embeddings(self.path)
+        tail = np.concatenate([chunk for _, chunk in self._stored_tail(old, new_embeddings, plan)])
+        del old
+        with open(self.path, 'r+b') as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            data_offset = f.tell()
+            header = _npy_header((len(plan),) + shape[1:], fortran_order, dtype, version)
+            if fortran_order or len(header) != data_offset:
+                # The header can't take the new row count without moving the data.
+                return self._rewrite_npy(new_embeddings, plan, new_hashes, info)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(tail, dtype=dtype).tobytes())
+            # The row count is only updated once the rows are on disk.
+            f.flush()
+            f.seek(0)
+            f.write(header)
+
+    def _rewrite_npy(self, new_embeddings, plan, new_hashes, info):
+        temp_path = self.path + '.tmp'
+        old = loader.open_embeddings(self.path)
+        output = np.lib.format.open_memmap(temp_path, mode='w+', dtype=old.dtype,
+                                           shape=(len(plan),) + old.shape[1:])
+        for start, chunk in self._stored_chunks(old, new_embeddings, plan):
+            output[start:start + len(chunk)] = chunk
+        output.flush()
+        del output, old
+        os.replace(temp_path, self.path)
+
+    def _append_pt(self, new_embeddings, plan, new_hashes, info):
+        # A .pt file is always written whole.
+        self._rewrite_pt(new_embeddings, plan, new_hashes, info)
+
+    def _rewrite_pt(self, new_embeddings, plan, new_hashes, info):
+        import torch
+        old = loader.open_embeddings(self.path)
+        data = np.concatenate([chunk for _, chunk in self._stored_chunks(old, new_embeddings, plan)])
+        del old
+        data = torch.from_numpy(data)
+        if self.precision == 'bfloat16':
+            data = data.view(torch.bfloat16)
+        if self.precision in ('int8', 'binary'):
+            data = {"embeddings": data, **self.metadata}
+        temp_path = self.path + '.tmp'
+        torch.save(data, temp_path)
+        os.replace(temp_path, self.path)
+
+    def _append_hdf5(self, new_embeddings, plan, new_hashes, info):
+        import h5py
+        with h5py.File(self.path, 'a') as f:
+            for name in ('embeddings', 'row_ids', 'text_hashes'):
+                f[name].resize(len(plan), axis=0)
+            for start, chunk in self._stored_tail(f['embeddings'], new_embeddings, plan):
+                rows = slice(start, start + len(chunk))
+                f['embeddings'][rows] = chunk
+                f['row_ids'][rows] = np.arange(rows.start, rows.stop)
+                f['text_hashes'][rows] = new_hashes[rows]
+            f.attrs['updated_at'] = (info or {}).get('created_at', '')
+
+    def _rewrite_hdf5(self, new_embeddings, plan, new_hashes, info):
+        import h5py
+        temp_path = self.path + '.tmp'
+        with h5py.File(self.path, 'r') as f:
+            old = f['embeddings']
+            attrs = dict(f.attrs)
+            attrs['updated_at'] = (info or {}).get('created_at', '')
+            writer = HDF5Writer(temp_path, old.shape[1], old.dtype, old.compression, attrs, dict(old.attrs),
+                                len(plan))
+            try:
+                for start, chunk in self._stored_chunks(old, new_embeddings, plan):
+                    writer.append(chunk, np.arange(start, start + len(chunk)), new_hashes[start:start + len(chunk)])
+            finally:
+                writer.close()
+        os.replace(temp_path, self.path)
+
+    def _append_faiss(self, new_embeddings, plan, new_hashes, info):
+        import faiss
+        index = faiss.read_index(self.path)
+        tail = plan[len(self.hashes):]
+        reused = tail >= 0
+        if reused.any():
+            # Repeats of indexed texts are added again from the index's own vectors.
+            index_type, _ = index_description(index)
+            if index_type in ('ivf_flat', 'ivf_pq'):
+                faiss.extract_index_ivf(index).make_direct_map()
+            vectors = np.empty((len(tail), index.d), dtype=np.float32)
+            vectors[reused] = index.reconstruct_batch(tail[reused])
+            vectors[~reused] = new_embeddings
+            new_embeddings = vectors
+        for start in range(0, len(new_embeddings), faiss_index.ADD_BATCH_SIZE):
+            index.add(np.ascontiguousarray(new_embeddings[start:start + faiss_index.ADD_BATCH_SIZE],
+                                           dtype=np.float32))
+        self._write_faiss(index)
+
+    def _rewrite_faiss(self, new_embeddings, plan, new_hashes, info):
+        # FAISS ids are row positions, so edits mean rebuilding the index from the old
+        # vectors (approximations of them for IVF-PQ) and the new ones.
+        import faiss
+        index = faiss.read_index(self.path)
+        index_type, metric = index_description(index)
+        if index_type in ('ivf_flat', 'ivf_pq'):
+            faiss.extract_index_ivf(index).make_direct_map()
+        vectors = np.empty((len(plan), index.d), dtype=np.float32)
+        reused = plan >= 0
+        if reused.any():
+            vectors[reused] = index.reconstruct_batch(plan[reused])
+        vectors[~reused] = new_embeddings
+        self._write_faiss(faiss_index.build_index(vectors, index_type, metric))
+
+    def _write_faiss(self, index):
+        import faiss
+        temp_path = self.path + '.tmp'
+        faiss.write_index(index, temp_path)
+        os.replace(temp_path, self.path)
+
+
+def index_description(index):
+    """Returns the (index_type, metric) an index was built with, as build_index names them."""
+    import faiss
+    metric = 'ip' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2'
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw', metric
+    elif isinstance(index, faiss.IndexIVFPQ):
+        return 'ivf_pq', metric
+    elif isinstance(index, faiss.IndexIVF):
+        return 'ivf_flat', metric
+    return 'flat', metric
+
+
+def _take_rows(data, rows):
+    if isinstance(data, np.ndarray):
+        return data[rows]
+    # h5py only reads increasing, unique indices.
+    unique_rows, inverse = np.unique(rows, return_inverse=True)
+    if not len(unique_rows):
+        return np.empty((0,) + data.shape[1:], dtype=data.dtype)
+    return data[unique_rows][inverse]
+
+
+def _npy_header(shape, fortran_order, dtype, version):
+    header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order, "shape": shape}
+    buffer = io.BytesIO()
+    if version == (1, 0):
+        np.lib.format.write_array_header_1_0(buffer, header)
+    else:
+        np.lib.format.write_array_header_2_0(buffer, header)
+    return buffer.getvalue()
@@ -0,0 +1,114 @@
+import os
+import json
+import shutil
+import filecmp
+import itertools
+
+import numpy as np
+
+from backend import readers, shards
+
+FILE_INDEX_SUFFIX = '.files.json'
+
+
+def expand_inputs(paths):
+    """Returns the input files among ``paths``, with directories searched recursively.
+
+    Files inside a directory are taken in name order and only if the readers support
+    them; hidden files and directories (checkpoints, temp files) are skipped. Paths
+    come back absolute and without duplicates.
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, directories, names in os.walk(path):
+            directories[:] = sorted(name for name in directories if not name.startswith('.'))
+            files.extend(os.path.join(root, name) for name in sorted(names)
+                         if not name.startswith('.') and os.path.splitext(name)[1] in readers.SUPPORTED_INPUT_FORMATS)
+    return list(dict.fromkeys(os.path.abspath(file_path) for file_path in files))
+
+
+def link_or_copy(file_path, directory):
+    """Puts ``file_path`` into ``directory`` and returns the new path.
+
+    A hard link is made when the file system allows it (same volume), which takes no
+    time or space; otherwise the file is copied. Inputs are normally read in place, so
+    this is only for keeping a copy that survives the original being moved or deleted.
+    A different file already there under the same name may be another job's input, so
+    it is left alone and the new one gets a numbered name (``data-1.csv``, ...).
+    """
+    os.makedirs(directory, exist_ok=True)
+    name, extension = os.path.splitext(os.path.basename(file_path))
+    for number in itertools.count():
+        destination = os.path.join(directory, f"{name}-{number}{extension}" if number else name + extension)
+        if os.path.exists(destination):
+            # The same file (or a copy of it with the same contents) is reused.
+            if os.path.samefile(file_path, destination) or filecmp.cmp(file_path, destination, shallow=False):
+                return destination
+            continue
+        try:
+            os.link(file_path, destination)
+        except FileExistsError:
+            continue
+        except OSError:
+            try:
+                # Exclusive creation, so a file that appeared in the meantime isn't overwritten.
+                with open(file_path, 'rb') as source, open(destination, 'xb') as target:
+                    shutil.copyfileobj(source, target)
+            except FileExistsError:
+                continue
+            shutil.copystat(file_path, destination)
+        return destination
+
+
+def output_names(input_paths, output_name):
+    """One output name per input file, ``<output_name>-<file name>``, numbered on clashes."""
+    names = []
+    for input_path in input_paths:
+        name = base = f"{output_name}-{os.path.splitext(os.path.basename(input_path))[0]}"
+        number = 2
+        while name in names:
+            name = f"{base}-{number}"
+            number += 1
+        names.append(name)
+    return names
+
+
+def file_index_path(output_path):
+    # The index belongs to the output as a whole, so a sharded one keeps it next to its manifest.
+    if shards.is_manifest(output_path):
+        base = output_path[:-len(shards.MANIFEST_SUFFIX)]
+    else:
+        base = os.path.splitext(output_path)[0]
+    return base + FILE_INDEX_SUFFIX
+
+
+def write_file_index(output_path, input_paths, row_counts):
+    """Records which rows of a combined output came from which input file."""
+    files = []
+    start = 0
+    for file_id, (input_path, count) in enumerate(zip(input_paths, row_counts)):
+        files.append({"file_id": file_id, "path": input_path, "start": start, "stop": start + count})
+        start += count
+    path = file_index_path(output_path)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({"total_rows": start, "files": files}, f, indent=2)
+    os.replace(temp_path, path)
+    return path
+
+
+def read_file_index(output_path):
+    with open(file_index_path(output_path)) as f:
+        return json.load(f)
+
+
+def file_ids(output_path):
+    """Returns the file id of every row of a combined output, as an int32 array."""
+    index = read_file_index(output_path)
+    ids = np.empty(index["total_rows"], dtype=np.int32)
+    for entry in index["files"]:
+        ids[entry["start"]:entry["stop"]] = entry["file_id"]
+    return ids
@@ -0,0 +1,181 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import readers, inputs
+from backend.checkpoint import hash_file
+from backend.engine import EmbeddingEngine
+
+
+class FileJob:
+    def __init__(self, input_file, output_name):
+        self.input_file = input_file
+        self.output_name = output_name
+        files = input_file if isinstance(input_file, list) else [input_file]
+        self.size = sum(os.path.getsize(file_path) for file_path in files)
+        self.status = 'queued'
+        self.progress = 0.0
+        self.output_file = None
+        self.stats = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "input_file": self.input_file,
+            "output_name": self.output_name,
+            "status": self.status,
+            "progress": self.progress,
+            "output_file": self.output_file,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Embeds many input files (or whole directories of them) one job after the other.
+
+    Every file gets its own output, named by ``inputs.output_names``, unless ``combine``
+    is set: then all files go into a single output, in order, with a file index that
+    maps row ranges to files (see ``inputs.file_ids``). The jobs share one engine and
+    the model stays loaded in the registry between them. While a job encodes, the next
+    file is counted (and fingerprinted, for resume) on a background thread; its rows are
+    only read once its own job starts.
+
+    Progress reports are the engine's stats for the current job plus ``job_index``,
+    ``job_count``, ``input_file`` and ``total_progress`` (by input size). A job that
+    fails is reported to ``on_job_finished`` and the queue moves on to the next one.
+    """
+
+    def __init__(self, input_paths, output_directory, model_name, output_name, output_format, batch_size,
+                 combine=False, on_progress=None, on_job_finished=None, on_completed=None, on_error=None,
+                 **options):
+        self.input_paths = input_paths
+        self.output_directory = output_directory
+        self.model_name = model_name
+        self.output_name = output_name
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.combine = combine
+        # Passed straight on to embed_file for every job.
+        self.options = options
+        self.on_progress = on_progress
+        self.on_job_finished = on_job_finished
+        self.on_completed = on_completed
+        self.on_error = on_error
+        self.engine = EmbeddingEngine(on_progress=self._on_progress, on_error=self._on_error)
+        self.jobs = []
+        self.current = None
+        self.cancel_flag = False
+
+    def cancel(self):
+        self.cancel_flag = True
+        self.engine.cancel_embedding()
+
+    def _report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+
+    def _on_progress(self, stats):
+        job = self.jobs[self.current]
+        job.progress = stats["progress"]
+        total_size = sum(job.size for job in self.jobs) or 1
+        done_size = sum(job.size for job in self.jobs[:self.current]) + job.size * job.progress / 100
+        if self.on_progress:
+            self.on_progress({
+                **stats,
+                "job_index": self.current,
+                "job_count": len(self.jobs),
+                "input_file": job.input_file,
+                "total_progress": min(done_size / total_size * 100, 100),
+            })
+
+    def _on_error(self, message):
+        self.jobs[self.current].error = message
+
+    def _prepare(self, job):
+        # Only warms the per-file caches; the job itself reports whatever is wrong with the file.
+        try:
+            readers.count_items(job.input_file, self.options.get('columns'), self.options.get('separator', ' '),
+                                self.options.get('header', False))
+            if self.options.get('resume', True):
+                hash_file(job.input_file)
+        except Exception:
+            pass
+
+    def run(self):
+        start_time = time.time()
+        try:
+            files = inputs.expand_inputs(self.input_paths)
+            if not files:
+                raise ValueError("No supported input files found")
+            if self.combine:
+                self.jobs = [FileJob(files, self.output_name)]
+            else:
+                self.jobs = [FileJob(file_path, name)
+                             for file_path, name in zip(files, inputs.output_names(files, self.output_name))]
+        except Exception as e:
+            self._report_error(f"An error occurred: {str(e)}")
+            return None
+
+        prefetcher = ThreadPoolExecutor(1, thread_name_prefix='job-prefetch')
+        prepared = None
+        try:
+            for job_index, job in enumerate(self.jobs):
+                if prepared:
+                    prepared.result()
+                # Checked after the wait above, which a cancel may have come in during.
+                if self.cancel_flag:
+                    job.status = 'cancelled'
+                    continue
+                if job_index + 1 < len(self.jobs):
+                    prepared = prefetcher.submit(self._prepare, self.jobs[job_index + 1])
+
+                self.current = job_index
+                job.status = 'running'
+                result = self.engine.embed_file(job.input_file, self.output_directory, self.model_name,
+                                                job.output_name, self.output_format, self.batch_size, **self.options)
+                if result:
+                    job.output_file, job.stats = result
+                    job.status = 'completed'
+                    job.progress = 100.0
+                elif self.engine.cancel_flag:
+                    job.status = 'cancelled'
+                else:
+                    job.status = 'failed'
+                if self.on_job_finished:
+                    self.on_job_finished(job.to_dict())
+        finally:
+            prefetcher.shutdown(wait=False)
+
+        if self.cancel_flag:
+            self._report_error("Embedding process was cancelled")
+            return None
+        finished = [job for job in self.jobs if job.status == 'completed']
+        if not finished:
+            self._report_error(f"None of the {len(self.jobs)} input files could be embedded")
+            return None
+
+        total_time = time.time() - start_time
+        items_processed = sum(job.stats["items_processed"] for job in finished)
+        summary = {
+            "progress": 100,
+            "total_progress": 100,
+            "items_processed": items_processed,
+            "speed": items_processed / total_time,
+            "eta": 0,
+            "error_count": sum(job.stats["error_count"] for job in finished),
+            "memory_usage": max(job.stats["memory_usage"] for job in finished),
+            "embedding_dim": finished[0].stats["embedding_dim"],
+            "model_name": self.model_name,
+            "output_size": sum(job.stats["output_size"] for job in finished),
+            "total_time": total_time,
+            "job_count": len(self.jobs),
+            "completed_jobs": len(finished),
+            "failed_jobs": len(self.jobs) - len(finished),
+            "jobs": [job.to_dict() for job in self.jobs],
+        }
+        output_path = finished[0].output_file if self.combine else self.output_directory
+        if self.combine:
+            summary["file_index"] = finished[0].stats["file_index"]
+        if self.on_completed:
+            self.on_completed(output_path, summary)
+        return output_path, summary
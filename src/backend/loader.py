@@ -0,0 +1,104 @@
+import os
+import json
+
+import numpy as np
+
+from backend import quantize, shards
+
+
+def output_format(path):
+    if shards.is_manifest(path):
+        raise ValueError("Sharded outputs are opened shard by shard with open_shards")
+    return os.path.splitext(path)[1].lstrip('.').lower()
+
+
+def read_metadata(path):
+    """Returns the quantization metadata of an output written by ``save_embeddings``."""
+    file_format = output_format(path)
+    if file_format == 'npy':
+        sidecar = path + '.json'
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                return json.load(f)
+    elif file_format == 'hdf5':
+        import h5py
+        with h5py.File(path, 'r') as f:
+            attrs = dict(f['embeddings'].attrs)
+        if 'precision' in attrs:
+            return {key: value.tolist() if isinstance(value, np.ndarray) else value
+                    for key, value in attrs.items()}
+    elif file_format == 'pt':
+        data = _load_pt(path)
+        if isinstance(data, dict):
+            return {key: value for key, value in data.items() if key != 'embeddings'}
+        if str(data.dtype) == 'torch.bfloat16':
+            return {"precision": 'bfloat16', "dim": data.shape[1]}
+        if str(data.dtype) == 'torch.float16':
+            return {"precision": 'float16', "dim": data.shape[1]}
+    elif file_format == 'faiss':
+        raise ValueError("FAISS indexes are read with faiss.read_index")
+    else:
+        raise ValueError(f"Unsupported output format: {file_format}")
+    return {"precision": 'float32'}
+
+
+def open_embeddings(path):
+    """Opens an existing output read-only without loading it into memory.
+
+    .npy files come back as a read-only memmap, .hdf5 files as the h5py dataset (sliced
+    lazily; it stays open until garbage collected) and .pt files as a memory-mapped
+    tensor's numpy view. Vectors are in their stored precision; ``read_embeddings``
+    turns a slice of them back into float32.
+    """
+    file_format = output_format(path)
+    if file_format == 'npy':
+        return np.load(path, mmap_mode='r')
+    elif file_format == 'hdf5':
+        import h5py
+        return h5py.File(path, 'r')['embeddings']
+    elif file_format == 'pt':
+        import torch
+        data = _load_pt(path)
+        if isinstance(data, dict):
+            data = data["embeddings"]
+        if data.dtype == torch.bfloat16:
+            data = data.view(torch.int16)
+        # Tensors loaded with mmap are writable, the numpy view of them doesn't have to be.
+        array = data.numpy()
+        if array.dtype == np.int16:
+            array = array.view(np.uint16)
+        array.flags.writeable = False
+        return array
+    elif file_format == 'faiss':
+        raise ValueError("FAISS indexes are read with faiss.read_index")
+    raise ValueError(f"Unsupported output format: {file_format}")
+
+
+def open_shards(path):
+    """Opens every shard listed in a manifest; returns (shard, vectors) pairs.
+
+    Each shard holds rows [shard["start"], shard["stop"]) of the whole output. To load
+    them in parallel, hand the manifest's ``shards`` entries to the workers instead.
+    """
+    return [(shard, open_embeddings(shard["path"])) for shard in shards.read_manifest(path)["shards"]]
+
+
+def read_embeddings(path, start=0, stop=None):
+    """Reads rows [start, stop) of an output (or of a sharded output's manifest) as float32."""
+    if not shards.is_manifest(path):
+        return quantize.dequantize(open_embeddings(path)[start:stop], read_metadata(path))
+
+    manifest = shards.read_manifest(path)
+    start, stop, _ = slice(start, stop).indices(manifest["total_rows"])
+    parts = [np.empty((0, manifest["embedding_dim"]), dtype=np.float32)]
+    for shard in manifest["shards"]:
+        if shard["stop"] <= start or shard["start"] >= stop:
+            continue
+        parts.append(read_embeddings(shard["path"], max(start, shard["start"]) - shard["start"],
+                                     min(stop, shard["stop"]) - shard["start"]))
+    return np.concatenate(parts)
+
+
+def _load_pt(path):
+    import torch
+    return torch.load(path, map_location='cpu', mmap=True, weights_only=True)
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import hashlib
+import inspect
+import threading
+import importlib.util
+
+import numpy as np
+
+from backend.pool import LocalEncoder
+
+# onnx and onnxruntime are optional dependencies (pip install onnx onnxruntime).
+
+INFERENCE_BACKENDS = {
+    'torch': "PyTorch",
+    'onnx': "ONNX Runtime",
+    'onnx-int8': "ONNX Runtime, int8 quantized",
+}
+ONNX_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.embeddium', 'onnx')
+ONNX_OPSET = 17
+# Lowest cosine similarity to the PyTorch embedding any parity sentence may have.
+PARITY_THRESHOLDS = {
+    'onnx': 0.9999,
+    'onnx-int8': 0.98,
+}
+PARITY_SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Embeddings map text to vectors so that similar meanings end up close together.",
+    "How do I reset my password?",
+    "Quarterly revenue grew 12% year over year, driven by subscription sales.",
+    "a",
+    "Die Katze sitzt auf der Matte.",
+    "Vector databases index millions of embeddings for fast nearest neighbour search, "
+    "trading a little recall for orders of magnitude lower latency.",
+    "1234 5678 !!! ???",
+]
+
+_onnx_models = {}
+_onnx_lock = threading.Lock()
+
+
+def artifact_directory(model_name, cache_dir=None):
+    # Model names can be paths, so the directory is named after a hash of the name.
+    cache_dir = cache_dir or ONNX_CACHE_DIR
+    digest = hashlib.sha256(model_name.encode('utf-8')).hexdigest()[:16]
+    name = os.path.basename(os.path.normpath(model_name)) or 'model'
+    return os.path.join(cache_dir, f"{name}-{digest}")
+
+
+def export_onnx(model, path):
+    """Exports the transformer of a SentenceTransformer (its first module) to ONNX."""
+    import torch
+
+    transformer = model[0]
+    if not hasattr(transformer, 'auto_model'):
+        raise ValueError("Only models that start with a Hugging Face transformer can be exported to ONNX")
+    features = transformer.tokenize(["Exporting the model to ONNX", "example"])
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in features]
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs)), return_dict=False)[0]
+
+    options = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        options['dynamo'] = False
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['token_embeddings']}
+    temp_path = path + '.tmp'
+    with torch.no_grad():
+        torch.onnx.export(TokenEmbeddings(transformer.auto_model).eval().cpu(),
+                          tuple(features[name].cpu() for name in input_names), temp_path,
+                          input_names=input_names, output_names=['token_embeddings'],
+                          dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET, **options)
+    os.replace(temp_path, path)
+
+
+def quantize_onnx(path, output_path):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    temp_path = output_path + '.tmp'
+    quantize_dynamic(path, temp_path, weight_type=QuantType.QInt8)
+    os.replace(temp_path, output_path)
+
+
+class OnnxModel:
+    """A SentenceTransformer whose transformer runs through ONNX Runtime on the CPU.
+
+    The transformer is exported once (and for ``onnx-int8`` dynamically quantized to int8
+    weights) into ``cache_dir`` (``ONNX_CACHE_DIR`` by default) and reused by later runs.
+    Tokenization and the modules after the transformer (pooling, dense, normalize) still
+    come from the PyTorch model, so any model the exporter handles gives the same kind of
+    vectors. A new artifact is checked against the PyTorch embeddings before it is used;
+    the result is kept in its ``meta.json``.
+    """
+
+    def __init__(self, model, model_name, backend='onnx', threads=None, cache_dir=None):
+        # onnx itself is only used (by torch) when exporting, but it's part of the same install.
+        if importlib.util.find_spec('onnx') is None:
+            raise ValueError("The ONNX backends need the onnx and onnxruntime packages")
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ValueError("The ONNX backends need the onnx and onnxruntime packages")
+
+        if backend not in PARITY_THRESHOLDS:
+            raise ValueError(f"Unsupported inference backend: {backend}")
+        self.model = model
+        self.model_name = model_name
+        self.backend = backend
+        self.directory = artifact_directory(model_name, cache_dir)
+        self.path = os.path.join(self.directory, 'model.int8.onnx' if backend == 'onnx-int8' else 'model.onnx')
+        self.meta_path = os.path.join(self.directory, 'meta.json')
+        self.export_time = self._ensure_artifact()
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+        meta = self._read_meta()
+        self.parity = meta.get('parity', {}).get(backend)
+        if self.parity is None:
+            self.parity = self.check_parity()
+            meta.setdefault('parity', {})[backend] = self.parity
+            self._write_meta(meta)
+        if not self.parity['passed']:
+            raise ValueError(f"The {INFERENCE_BACKENDS[backend]} export of {model_name} doesn't match PyTorch "
+                             f"(lowest cosine similarity {self.parity['min_cosine']:.5f})")
+
+    @property
+    def device(self):
+        return self.model.device
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta):
+        with open(self.meta_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def _ensure_artifact(self):
+        if os.path.exists(self.path):
+            return 0.0
+        import torch
+        import transformers
+
+        start_time = time.time()
+        os.makedirs(self.directory, exist_ok=True)
+        float_path = os.path.join(self.directory, 'model.onnx')
+        if not os.path.exists(float_path):
+            export_onnx(self.model, float_path)
+            # Parity results belong to the artifact they were measured on.
+            self._write_meta({
+                "model_name": self.model_name,
+                "opset": ONNX_OPSET,
+                "torch": torch.__version__,
+                "transformers": transformers.__version__,
+                "exported_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            })
+        if self.path != float_path:
+            quantize_onnx(float_path, self.path)
+        return time.time() - start_time
+
+    def forward(self, features):
+        """Runs tokenized ``features`` through the session and the remaining modules."""
+        import torch
+
+        inputs = {name: features[name].cpu().numpy().astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(['token_embeddings'], inputs)[0]
+        output = {
+            'token_embeddings': torch.from_numpy(token_embeddings),
+            'attention_mask': features['attention_mask'].cpu(),
+        }
+        with torch.no_grad():
+            for module in list(self.model)[1:]:
+                output = module(output)
+        embeddings = output['sentence_embedding']
+        if self.model.truncate_dim:
+            embeddings = embeddings[..., :self.model.truncate_dim]
+        return embeddings.float().numpy()
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.concatenate([self.forward(self.model.tokenize(texts[start:start + batch_size]))
+                               for start in range(0, len(texts), batch_size)])
+
+    def check_parity(self, texts=None):
+        texts = texts or PARITY_SENTENCES
+        reference = self.model.encode(texts, convert_to_numpy=True)
+        vectors = self.encode(texts)
+        cosine = (reference * vectors).sum(axis=1) / (
+            np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1) + 1e-12)
+        return {
+            "min_cosine": float(cosine.min()),
+            "mean_cosine": float(cosine.mean()),
+            "max_abs_diff": float(np.abs(reference - vectors).max()),
+            "passed": bool(cosine.min() >= PARITY_THRESHOLDS[self.backend]),
+        }
+
+
+class OnnxEncoder(LocalEncoder):
+    """LocalEncoder whose encoder stage runs an OnnxModel instead of the PyTorch forward."""
+
+    def __init__(self, onnx_model, tokenizer_threads=2):
+        super().__init__(onnx_model.model, tokenizer_threads)
+        self.onnx_model = onnx_model
+
+    def _encode(self, features):
+        features = features.result()
+        with self.lock:
+            self.encode_queue -= 1
+        start_time = time.time()
+        vectors = self.onnx_model.forward(features)
+        self.encode_timer.add(time.time() - start_time)
+        return vectors
+
+
+def load_onnx_model(model, model_name, backend='onnx', threads=None):
+    """Returns the OnnxModel for (model_name, backend, threads); sessions stay open for later jobs."""
+    key = (model_name, backend, threads)
+    with _onnx_lock:
+        onnx_model = _onnx_models.get(key)
+        if onnx_model is None or onnx_model.model is not model:
+            onnx_model = _onnx_models[key] = OnnxModel(model, model_name, backend, threads)
+        return onnx_model
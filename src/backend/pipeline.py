@@ -0,0 +1,235 @@
+import time
+import queue
+import threading
+from itertools import islice
+from concurrent.futures import CancelledError
+
+import numpy as np
+
+from backend.scheduler import row_index
+
+# Marks the end of a stage's queue.
+_DONE = object()
+
+
+class StageTimer:
+    """Adds up the time a pipeline stage spends working, to report its utilization."""
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.start_time = time.time()
+        self.busy_time = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, elapsed):
+        with self.lock:
+            self.busy_time += elapsed
+
+    def utilization(self):
+        available = (time.time() - self.start_time) * self.workers
+        return min(self.busy_time / available, 1.0) if available > 0 else 0.0
+
+
+def grow_buffer(embeddings, min_rows):
+    grown = np.zeros((max(min_rows, len(embeddings) * 2), embeddings.shape[1]), dtype=embeddings.dtype)
+    grown[:len(embeddings)] = embeddings
+    return grown
+
+
+class Prefetcher:
+    """Reads texts on a background thread so that parsing the input overlaps with encoding.
+
+    Texts are handed over in chunks of ``chunk_size``, and at most ``max_chunks`` chunks
+    are read ahead. An exception raised by the reader is re-raised by the consumer.
+    """
+
+    def __init__(self, texts, chunk_size, max_chunks=8):
+        self.texts = texts
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(max_chunks)
+        self.timer = StageTimer()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='reader', daemon=True)
+        self.thread.start()
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield from item
+
+    def stats(self):
+        return {
+            "reader_queue": self.queue.qsize(),
+            "reader_utilization": self.timer.utilization(),
+        }
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        texts = iter(self.texts)
+        try:
+            while not self.stopped.is_set():
+                start_time = time.time()
+                chunk = list(islice(texts, self.chunk_size))
+                self.timer.add(time.time() - start_time)
+                if not chunk:
+                    break
+                self._put(chunk)
+            self._put(_DONE)
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        # Waits for room in the queue, but gives up once the consumer has gone away.
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+class AsyncWriter:
+    """Writes finished batches into the output buffer on a background thread.
+
+    Entries are handled strictly in the order they were queued: a copy of rows only runs
+    after the batch that fills them, and a checkpoint commit only after every batch that
+    was queued before it. At most ``max_queue`` entries wait, which is what bounds the
+    number of batches in flight.
+
+    Rows of a batch whose encoding failed stay zero and are counted in ``error_count``,
+    as are later copies of them.
+
+    After ``cancel()`` the remaining entries are dropped; the first row of each dropped
+    batch ends up in ``unwritten_rows`` so the caller doesn't commit rows that were
+    never filled.
+    """
+
+    def __init__(self, embeddings, max_queue, cache=None, model_name=None, checkpoint=None,
+                 error_count=0, on_error=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.checkpoint = checkpoint
+        self.on_error = on_error
+        self.rows_written = 0
+        self.error_count = error_count
+        self.unwritten_rows = []
+        self.failed_rows = None
+        self.error = None
+        self.cancelled = False
+        self.queue = queue.Queue(max_queue)
+        self.timer = StageTimer()
+        self.thread = threading.Thread(target=self._run, name='writer', daemon=True)
+        self.thread.start()
+
+    def write(self, batch_number, batch, future=None):
+        self.queue.put(('batch', batch_number, batch, future))
+
+    def commit(self, committed_rows, committed_batches):
+        self.queue.put(('commit', committed_rows, committed_batches))
+
+    def check(self):
+        # Failures of the writer itself (disk full, ...) end the job.
+        if self.error:
+            raise self.error
+
+    def cancel(self):
+        self.cancelled = True
+
+    def close(self):
+        self.queue.put(_DONE)
+        self.thread.join()
+
+    def stats(self):
+        return {
+            "writer_queue": self.queue.qsize(),
+            "writer_utilization": self.timer.utilization(),
+        }
+
+    def _run(self):
+        while True:
+            entry = self.queue.get()
+            if entry is _DONE:
+                return
+            if entry[0] == 'commit':
+                if not self.cancelled and not self.error:
+                    try:
+                        self._commit(*entry[1:])
+                    except Exception as e:
+                        self.error = e
+                continue
+
+            batch_number, batch, future = entry[1:]
+            if self.cancelled or self.error:
+                self.unwritten_rows.append(min(batch.rows))
+                continue
+            try:
+                self._write(batch_number, batch, future)
+            except CancelledError:
+                self.unwritten_rows.append(min(batch.rows))
+            except Exception as e:
+                self.error = e
+                self.unwritten_rows.append(min(batch.rows))
+
+    def _write(self, batch_number, batch, future):
+        vectors = batch.vectors
+        if future is not None:
+            try:
+                vectors = future.result()
+            except CancelledError:
+                raise
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(f"Error embedding batch {batch_number}: {str(e)}")
+                # The rows stay zero so the output stays aligned with the input.
+                self.error_count += len(batch.rows)
+                self.rows_written += len(batch.rows)
+                self._mark_failed(batch.rows)
+                return
+
+        start_time = time.time()
+        needed_rows = max(batch.rows) + 1
+        if needed_rows > len(self.embeddings):
+            self.embeddings = (self.checkpoint.grow(needed_rows) if self.checkpoint
+                               else grow_buffer(self.embeddings, needed_rows))
+
+        if batch.source_rows is not None:
+            self.embeddings[row_index(batch.rows)] = self.embeddings[row_index(batch.source_rows)]
+            # Copies of a row whose batch failed are just as empty, so they count as errors too.
+            self.error_count += self._failed_count(batch.source_rows)
+        else:
+            if future is not None and self.cache:
+                self.cache.put_many(self.model_name, batch.keys, vectors)
+            if batch.take is not None:
+                vectors = vectors[batch.take]
+            self.embeddings[row_index(batch.rows)] = vectors
+        self.rows_written += len(batch.rows)
+        self.timer.add(time.time() - start_time)
+
+    def _mark_failed(self, rows):
+        # Only allocated once a batch fails, which most runs never see.
+        needed_rows = max(rows) + 1
+        if self.failed_rows is None or needed_rows > len(self.failed_rows):
+            grown = np.zeros(max(needed_rows, len(self.embeddings)), dtype=bool)
+            if self.failed_rows is not None:
+                grown[:len(self.failed_rows)] = self.failed_rows
+            self.failed_rows = grown
+        self.failed_rows[np.asarray(rows)] = True
+
+    def _failed_count(self, rows):
+        if self.failed_rows is None:
+            return 0
+        rows = np.asarray(rows)
+        return int(self.failed_rows[rows[rows < len(self.failed_rows)]].sum())
+
+    def _commit(self, committed_rows, committed_batches):
+        start_time = time.time()
+        self.checkpoint.commit(committed_rows, committed_batches, self.error_count)
+        self.timer.add(time.time() - start_time)
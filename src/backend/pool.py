@@ -0,0 +1,176 @@
+import os
+import copy
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from backend.pipeline import StageTimer
+
+_worker_model = None
+
+
+def _init_worker(model_name, devices, num_threads):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    device = devices.get()
+    if num_threads and device == 'cpu':
+        torch.set_num_threads(num_threads)
+    _worker_model = SentenceTransformer(model_name, device=device)
+
+
+def _encode(texts):
+    start_time = time.time()
+    # The scheduler already sized (and length-sorted) the batch, so it goes through whole.
+    vectors = _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+    return vectors, time.time() - start_time
+
+
+class LocalEncoder:
+    """Encodes with the model of this process in two stages.
+
+    Batches are tokenized on a pool of ``tokenizer_threads`` threads and then run
+    through the model, one at a time, on an encoder thread. Tokenizing the next batches
+    therefore overlaps with the forward pass of the current one. Each tokenizer thread
+    uses its own copy of the tokenizer, because fast tokenizers can't be shared between
+    threads.
+    """
+
+    def __init__(self, model, tokenizer_threads=2):
+        self.model = model
+        self.model.eval()
+        self.max_in_flight = tokenizer_threads + 2
+        self.tokenize_timer = StageTimer(tokenizer_threads)
+        self.encode_timer = StageTimer()
+        self.tokenize_queue = 0
+        self.encode_queue = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.tokenizers = ThreadPoolExecutor(tokenizer_threads, thread_name_prefix='tokenizer')
+        self.encoder = ThreadPoolExecutor(1, thread_name_prefix='encoder')
+
+    @property
+    def encode_time(self):
+        return self.encode_timer.busy_time
+
+    def submit(self, texts):
+        with self.lock:
+            self.tokenize_queue += 1
+        features = self.tokenizers.submit(self._tokenize, texts)
+        return self.encoder.submit(self._encode, features)
+
+    def stats(self):
+        return {
+            "tokenizer_queue": self.tokenize_queue,
+            "tokenizer_utilization": self.tokenize_timer.utilization(),
+            "encoder_queue": self.encode_queue,
+            "encoder_utilization": self.encode_timer.utilization(),
+        }
+
+    def close(self):
+        self.tokenizers.shutdown(wait=True, cancel_futures=True)
+        self.encoder.shutdown(wait=True, cancel_futures=True)
+
+    def _tokenize(self, texts):
+        with self.lock:
+            self.tokenize_queue -= 1
+        start_time = time.time()
+        features = self._tokenizer_module().tokenize(texts)
+        self.tokenize_timer.add(time.time() - start_time)
+        with self.lock:
+            self.encode_queue += 1
+        return features
+
+    def _encode(self, features):
+        import torch
+        from sentence_transformers.util import batch_to_device
+
+        features = features.result()
+        with self.lock:
+            self.encode_queue -= 1
+        start_time = time.time()
+        # The same steps as SentenceTransformer.encode(), minus the tokenization.
+        with torch.no_grad():
+            output = self.model.forward(batch_to_device(features, self.model.device))
+        embeddings = output['sentence_embedding']
+        if self.model.truncate_dim:
+            embeddings = embeddings[..., :self.model.truncate_dim]
+        vectors = embeddings.detach().float().cpu().numpy()
+        self.encode_timer.add(time.time() - start_time)
+        return vectors
+
+    def _tokenizer_module(self):
+        module = getattr(self.local, 'module', None)
+        if module is None:
+            first_module = self.model[0]
+            module = first_module
+            if hasattr(first_module, 'tokenizer'):
+                # A shallow copy shares the weights; only the tokenizer is duplicated.
+                module = copy.copy(first_module)
+                module.tokenizer = copy.deepcopy(first_module.tokenizer)
+            self.local.module = module
+        return module
+
+
+class EncoderPool:
+    """Shards batches across worker processes, one per entry of ``devices``.
+
+    Each worker loads its own copy of the model. CPU workers split the machine's cores
+    between them so that 32 single-threaded encoders don't fight over the same threads.
+    ``encode_time`` adds up the time the workers spent encoding, not wall-clock time.
+    """
+
+    def __init__(self, model_name, devices):
+        context = multiprocessing.get_context('spawn')
+        device_queue = context.Queue()
+        for device in devices:
+            device_queue.put(device)
+
+        cpu_workers = sum(1 for device in devices if device == 'cpu')
+        num_threads = max(1, (os.cpu_count() or 1) // cpu_workers) if cpu_workers else None
+
+        self.devices = list(devices)
+        self.max_in_flight = 2 * len(devices)
+        self.encode_time = 0.0
+        self.start_time = time.time()
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(
+            max_workers=len(devices),
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_name, device_queue, num_threads),
+        )
+
+    def submit(self, texts):
+        future = Future()
+
+        def unwrap(worker_future):
+            with self.lock:
+                self.in_flight -= 1
+            try:
+                vectors, elapsed = worker_future.result()
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                with self.lock:
+                    self.encode_time += elapsed
+                future.set_result(vectors)
+
+        with self.lock:
+            self.in_flight += 1
+        self.executor.submit(_encode, texts).add_done_callback(unwrap)
+        return future
+
+    def stats(self):
+        # Workers tokenize their own batches, so there is no separate tokenizer stage.
+        available = (time.time() - self.start_time) * len(self.devices)
+        return {
+            "encoder_queue": self.in_flight,
+            "encoder_utilization": min(self.encode_time / available, 1.0) if available > 0 else 0.0,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
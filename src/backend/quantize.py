@@ -0,0 +1,111 @@
+import numpy as np
+
+PRECISIONS = {
+    'float32': "float32 (full precision)",
+    'float16': "float16 (2x smaller)",
+    'bfloat16': "bfloat16 (2x smaller)",
+    'int8': "int8 scalar quantized (4x smaller)",
+    'binary': "Binary quantized (32x smaller)",
+}
+
+# How each precision is stored on disk. numpy has no bfloat16, so those are kept as the
+# raw upper 16 bits of the float32 value.
+STORAGE_DTYPES = {
+    'float32': np.float32,
+    'float16': np.float16,
+    'bfloat16': np.uint16,
+    'int8': np.int8,
+    'binary': np.uint8,
+}
+
+# Rows are converted this many at a time, so a memmapped buffer is never copied whole.
+CHUNK_SIZE = 65536
+
+
+def output_shape(shape, precision):
+    rows, dim = shape
+    if precision == 'binary':
+        return rows, (dim + 7) // 8
+    return rows, dim
+
+
+def vector_size(dim, precision):
+    return output_shape((1, dim), precision)[1] * np.dtype(STORAGE_DTYPES[precision]).itemsize
+
+
+def calibrate(embeddings, precision):
+    """Returns the metadata needed to quantize (and later restore) ``embeddings``.
+
+    int8 maps every dimension's [min, max] range onto the 256 codes, so the per-dimension
+    ``scale`` and ``offset`` are computed here in one pass over the rows.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision: {precision}")
+
+    metadata = {"precision": precision, "dim": int(embeddings.shape[1])}
+    if precision == 'int8':
+        minimum = np.full(embeddings.shape[1], np.inf, dtype=np.float32)
+        maximum = np.full(embeddings.shape[1], -np.inf, dtype=np.float32)
+        for start in range(0, len(embeddings), CHUNK_SIZE):
+            chunk = embeddings[start:start + CHUNK_SIZE]
+            minimum = np.minimum(minimum, chunk.min(axis=0))
+            maximum = np.maximum(maximum, chunk.max(axis=0))
+        if not len(embeddings):
+            minimum[:] = maximum[:] = 0
+        scale = (maximum - minimum) / 255
+        # Constant dimensions would divide by zero; any scale restores them exactly.
+        scale[scale == 0] = 1
+        metadata["scale"] = scale.tolist()
+        metadata["offset"] = minimum.tolist()
+    elif precision == 'binary':
+        metadata["threshold"] = 0.0
+    return metadata
+
+
+def quantize(chunk, metadata):
+    precision = metadata["precision"]
+    chunk = np.asarray(chunk, dtype=np.float32)
+
+    if precision == 'float32':
+        return np.ascontiguousarray(chunk)
+    elif precision == 'float16':
+        return chunk.astype(np.float16)
+    elif precision == 'bfloat16':
+        # Round to nearest even on the 16 bits that are dropped.
+        bits = chunk.view(np.uint32)
+        rounded = bits + np.uint32(0x7FFF) + ((bits >> 16) & np.uint32(1))
+        return (rounded >> 16).astype(np.uint16)
+    elif precision == 'int8':
+        scale = np.asarray(metadata["scale"], dtype=np.float32)
+        offset = np.asarray(metadata["offset"], dtype=np.float32)
+        codes = np.rint((chunk - offset) / scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+    elif precision == 'binary':
+        return np.packbits(chunk > metadata["threshold"], axis=1)
+    raise ValueError(f"Unsupported precision: {precision}")
+
+
+def quantize_all(embeddings, metadata):
+    output = np.empty(output_shape(embeddings.shape, metadata["precision"]),
+                      dtype=STORAGE_DTYPES[metadata["precision"]])
+    for start in range(0, len(embeddings), CHUNK_SIZE):
+        output[start:start + CHUNK_SIZE] = quantize(embeddings[start:start + CHUNK_SIZE], metadata)
+    return output
+
+
+def dequantize(data, metadata):
+    """Turns stored vectors back into float32 (binary vectors become 0/1)."""
+    precision = metadata["precision"]
+    data = np.asarray(data)
+
+    if precision in ('float32', 'float16'):
+        return data.astype(np.float32)
+    elif precision == 'bfloat16':
+        return (data.astype(np.uint32) << 16).view(np.float32)
+    elif precision == 'int8':
+        scale = np.asarray(metadata["scale"], dtype=np.float32)
+        offset = np.asarray(metadata["offset"], dtype=np.float32)
+        return (data.astype(np.float32) + 128) * scale + offset
+    elif precision == 'binary':
+        return np.unpackbits(data, axis=1, count=metadata["dim"]).astype(np.float32)
+    raise ValueError(f"Unsupported precision: {precision}")
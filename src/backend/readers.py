@@ -0,0 +1,309 @@
+import os
+import json
+from itertools import islice
+
+SUPPORTED_INPUT_FORMATS = ['.txt', '.csv', '.json', '.jsonl', '.xlsx']
+
+# Only the head of the file is handed to chardet; sniffing a multi-GB CSV in full
+# costs as much memory as the file itself.
+ENCODING_SAMPLE_SIZE = 64 * 1024
+CSV_CHUNK_SIZE = 10000
+JSON_READ_SIZE = 1024 * 1024
+COUNT_BLOCK_SIZE = 1024 * 1024
+
+# Counts are kept per file version; a file that was counted ahead of time (see
+# JobQueue) isn't read for it again.
+_item_counts = {}
+
+
+def detect_encoding(file_path, sample_size=ENCODING_SAMPLE_SIZE):
+    import chardet
+    with open(file_path, 'rb') as file:
+        raw_data = file.read(sample_size)
+    encoding = chardet.detect(raw_data)['encoding']
+    # A pure-ASCII head says nothing about the rest of the file, so fall back to
+    # the superset rather than failing on the first accented character.
+    if encoding is None or encoding.lower() == 'ascii':
+        return 'utf-8'
+    return encoding
+
+
+def iter_texts(file_path, columns=None, separator=' ', header=False, row_counts=None):
+    """Yields one text per item of the file.
+
+    ``columns``, ``separator`` and ``header`` only apply to tables (CSV and XLSX):
+    the selected columns (all by default, given by name or position) are joined
+    with ``separator``, and with ``header`` the first row is taken as column names
+    instead of being embedded.
+
+    ``file_path`` may also be a list of files, read one after the other; ``row_counts``
+    (a list) then gets the number of items of each file once it has been read.
+    """
+    if isinstance(file_path, (list, tuple)):
+        return _iter_files(file_path, columns, separator, header, row_counts)
+
+    _, file_extension = os.path.splitext(file_path)
+
+    if file_extension not in SUPPORTED_INPUT_FORMATS:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+    if file_extension == '.txt':
+        return _iter_txt(file_path)
+    elif file_extension == '.csv':
+        return _iter_csv(file_path, columns, separator, header)
+    elif file_extension == '.json':
+        return _iter_json(file_path)
+    elif file_extension == '.jsonl':
+        return _iter_jsonl(file_path)
+    elif file_extension == '.xlsx':
+        return _iter_xlsx(file_path, columns, separator, header)
+
+
+def count_items(file_path, columns=None, separator=' ', header=False):
+    """Returns the number of items in the file, without parsing it.
+
+    Only the XLSX count is exact. Text, JSONL and CSV files are counted by their line
+    breaks, which also counts blank lines and line breaks inside quoted CSV fields, and
+    a JSON array is estimated from the size of the items at its head. The count only
+    sizes the output buffer (which grows if it is too small) and the progress bar.
+    """
+    if isinstance(file_path, (list, tuple)):
+        return sum(count_items(path, columns, separator, header) for path in file_path)
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, repr(columns), separator, header)
+    if key not in _item_counts:
+        _item_counts[key] = _count_items(file_path, columns, separator, header)
+    return _item_counts[key]
+
+
+def _count_items(file_path, columns=None, separator=' ', header=False):
+    _, file_extension = os.path.splitext(file_path)
+
+    if file_extension in ('.txt', '.jsonl'):
+        return _count_lines(file_path)
+
+    elif file_extension == '.csv':
+        count = _count_lines(file_path)
+        return max(count - 1, 0) if header else count
+
+    elif file_extension == '.json':
+        return _estimate_json_items(file_path)
+
+    elif file_extension == '.xlsx':
+        import openpyxl
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            # max_row would also count the blank rows _iter_xlsx skips.
+            count = sum(1 for _ in _xlsx_rows(workbook.worksheets[0]))
+        finally:
+            workbook.close()
+        return max(count - 1, 0) if header else count
+
+    return sum(1 for _ in iter_texts(file_path, columns, separator, header))
+
+
+def _count_lines(file_path):
+    count = 0
+    last_block = b''
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(COUNT_BLOCK_SIZE), b''):
+            count += block.count(b'\n')
+            last_block = block
+    # The last line need not end in a line break.
+    if last_block and not last_block.endswith(b'\n'):
+        count += 1
+    return count
+
+
+def _estimate_json_items(file_path):
+    size = os.path.getsize(file_path)
+    if size <= JSON_READ_SIZE:
+        return sum(1 for _ in _iter_json(file_path))
+
+    with open(file_path, 'rb') as file:
+        head = file.read(JSON_READ_SIZE).decode('utf-8', errors='ignore')
+    pos = _skip_whitespace(head, 0)
+    if not head.startswith('[', pos):
+        # Not an array, so it is loaded whole anyway.
+        return sum(1 for _ in _iter_json(file_path))
+
+    decoder = json.JSONDecoder()
+    pos += 1
+    count = 0
+    while True:
+        try:
+            _, end = decoder.raw_decode(head, _skip_whitespace(head, pos))
+        except json.JSONDecodeError:
+            break
+        count += 1
+        pos = _skip_whitespace(head, end)
+        if pos >= len(head) or head[pos] != ',':
+            break
+        pos += 1
+    if count == 0:
+        # Not even the first item fits in the head.
+        return max(size // JSON_READ_SIZE, 1)
+    return max(size * count // len(head[:pos].encode('utf-8')), count)
+
+
+def rows_to_texts(frame, separator=' '):
+    # Joining whole columns at once instead of building a Series per row with
+    # iterrows() is what makes large tables fast.
+    if len(frame.columns) == 0:
+        return [''] * len(frame)
+    columns = [frame[label].astype(str) for label in frame.columns]
+    return columns[0].str.cat(columns[1:], sep=separator).tolist()
+
+
+def iter_batches(texts, batch_size):
+    texts = iter(texts)
+    while True:
+        batch = list(islice(texts, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _iter_files(file_paths, columns=None, separator=' ', header=False, row_counts=None):
+    for file_path in file_paths:
+        count = 0
+        for text in iter_texts(file_path, columns, separator, header):
+            count += 1
+            yield text
+        if row_counts is not None:
+            row_counts.append(count)
+
+
+def _iter_txt(file_path):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def _iter_csv(file_path, columns=None, separator=' ', header=False):
+    import pandas as pd
+    encoding = detect_encoding(file_path)
+    if columns is not None and header:
+        names = pd.read_csv(file_path, encoding=encoding, nrows=0).columns
+        columns = _column_labels(columns, names)
+    reader = pd.read_csv(file_path, encoding=encoding, header=0 if header else None,
+                         usecols=columns, chunksize=CSV_CHUNK_SIZE)
+    for chunk in reader:
+        if columns is not None:
+            chunk = chunk[columns]
+        yield from rows_to_texts(chunk, separator)
+
+
+def _iter_json(file_path):
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        buffer = file.read(JSON_READ_SIZE)
+        eof = not buffer
+        pos = _skip_whitespace(buffer, 0)
+
+        if pos >= len(buffer) or buffer[pos] != '[':
+            # Only top-level arrays can be streamed; anything else is small enough
+            # in practice to be handled the old way.
+            file.seek(0)
+            for item in json.load(file):
+                yield json.dumps(item)
+            return
+
+        pos += 1
+        expect_value = True
+        while True:
+            pos = _skip_whitespace(buffer, pos)
+            if pos < len(buffer):
+                char = buffer[pos]
+                if char == ']':
+                    return
+                if not expect_value:
+                    if char != ',':
+                        raise ValueError(f"Expected ',' or ']' in JSON array in {file_path}")
+                    pos += 1
+                    expect_value = True
+                    continue
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A number cut off at the end of the buffer (or after "1." of
+                    # "1.5") still decodes, so only trust a value once its
+                    # delimiter has been read.
+                    if eof or (end < len(buffer) and buffer[end] in ' \t\r\n,]'):
+                        yield json.dumps(item)
+                        pos = end
+                        expect_value = False
+                        continue
+            elif eof:
+                raise ValueError(f"Unexpected end of JSON array in {file_path}")
+
+            chunk = file.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def _iter_jsonl(file_path):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.dumps(json.loads(line))
+
+
+def _iter_xlsx(file_path, columns=None, separator=' ', header=False):
+    import openpyxl
+    import pandas as pd
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = _xlsx_rows(workbook.worksheets[0])
+        names = None
+        if header:
+            names = list(next(rows, None) or [])
+        positions = None
+        if columns is not None:
+            labels = names if names is not None else []
+            positions = [_column_position(column, labels) for column in columns]
+
+        while True:
+            chunk = list(islice(rows, CSV_CHUNK_SIZE))
+            if not chunk:
+                return
+            # dtype=object keeps the cell values as they are, so numbers are
+            # rendered by str() exactly like a cell-by-cell join would.
+            frame = pd.DataFrame(chunk, dtype=object).fillna('nan')
+            if positions is not None:
+                frame = frame.reindex(columns=positions, fill_value='nan')
+            yield from rows_to_texts(frame, separator)
+    finally:
+        workbook.close()
+
+
+def _xlsx_rows(worksheet):
+    # Read-only sheets also yield the empty (often only formatted) rows up to the sheet's
+    # dimensions, which would otherwise turn into "nan nan ..." texts.
+    return (row for row in worksheet.iter_rows(values_only=True) if any(cell is not None for cell in row))
+
+
+def _column_labels(columns, names):
+    names = list(names)
+    return [names[_column_position(column, names)] for column in columns]
+
+
+def _column_position(column, names):
+    if isinstance(column, int):
+        return column
+    if column not in names:
+        raise ValueError(f"Column not found: {column}")
+    return names.index(column)
+
+
+def _skip_whitespace(buffer, pos):
+    while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+        pos += 1
+    return pos
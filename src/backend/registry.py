@@ -0,0 +1,144 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import psutil
+
+# The sentence-transformers models offered in the model menu (and benchmarked by default).
+AVAILABLE_MODELS = [
+    "all-mpnet-base-v2",
+    "multi-qa-mpnet-base-dot-v1",
+    "all-distilroberta-v1",
+    "all-MiniLM-L12-v2",
+    "multi-qa-distilbert-cos-v1",
+    "all-MiniLM-L6-v2",
+    "multi-qa-MiniLM-L6-cos-v1",
+    "paraphrase-multilingual-mpnet-base-v2",
+    "paraphrase-albert-small-v2",
+    "paraphrase-multilingual-MiniLM-L12-v2",
+    "paraphrase-MiniLM-L3-v2",
+    "distiluse-base-multilingual-cased-v1",
+    "distiluse-base-multilingual-cased-v2"
+]
+
+
+def model_size(model):
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def resolve_device(device):
+    # A model loaded without a device lands on the one sentence-transformers picks, so
+    # None and that device name must share a registry entry.
+    if device is not None:
+        return device
+    import torch
+    if torch.cuda.is_available():
+        return 'cuda'
+    if torch.backends.mps.is_available():
+        return 'mps'
+    return 'cpu'
+
+
+class ModelRegistry:
+    """Keeps recently used models loaded so back-to-back jobs skip reading the weights again.
+
+    Models are keyed by (model name, resolved device) and evicted least-recently-used first once
+    their combined parameter size goes over ``max_memory_mb``. The model that was just
+    requested is never evicted, even if it alone is over the limit.
+    """
+
+    def __init__(self, max_memory_mb=None):
+        if max_memory_mb is None:
+            max_memory_mb = psutil.virtual_memory().total / 1024**2 / 4
+        self.max_memory = max_memory_mb * 1024**2
+        self.models = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def get(self, model_name, device=None):
+        """Returns ``(model, load_time)``; ``load_time`` is 0 for a model that was already warm."""
+        device = resolve_device(device)
+        key = (model_name, device)
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key][0], 0.0
+            future = self.loading.get(key)
+            owner = future is None
+            if owner:
+                future = self.loading[key] = Future()
+
+        if not owner:
+            # Someone else (usually a preload) is already reading these weights.
+            start_time = time.time()
+            model = future.result()
+            return model, time.time() - start_time
+
+        start_time = time.time()
+        try:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name, device=device)
+        except Exception as e:
+            with self.lock:
+                del self.loading[key]
+            future.set_exception(e)
+            raise
+        load_time = time.time() - start_time
+
+        with self.lock:
+            self.models[key] = (model, model_size(model))
+            del self.loading[key]
+            self._evict(keep=key)
+        future.set_result(model)
+        return model, load_time
+
+    def preload(self, model_name, device=None):
+        thread = threading.Thread(target=self._preload, args=(model_name, device), daemon=True)
+        thread.start()
+        return thread
+
+    def is_loaded(self, model_name, device=None):
+        key = (model_name, resolve_device(device))
+        with self.lock:
+            return key in self.models
+
+    def memory_usage(self):
+        with self.lock:
+            return self._total_size()
+
+    def clear(self):
+        with self.lock:
+            self.models.clear()
+        self._release_gpu_memory()
+
+    def _preload(self, model_name, device):
+        try:
+            self.get(model_name, device)
+        except Exception:
+            # The job that actually needs the model will report the error.
+            pass
+
+    def _evict(self, keep):
+        evicted = False
+        while self._total_size() > self.max_memory and len(self.models) > 1:
+            oldest = next(iter(self.models))
+            if oldest == keep:
+                self.models.move_to_end(oldest)
+                continue
+            del self.models[oldest]
+            evicted = True
+        if evicted:
+            self._release_gpu_memory()
+
+    def _total_size(self):
+        return sum(size for _, size in self.models.values())
+
+    def _release_gpu_memory(self):
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+registry = ModelRegistry()
@@ -0,0 +1,221 @@
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+
+from backend.readers import iter_batches
+from backend.cache import text_key
+
+# rows:        buffer rows this batch fills
+# texts/keys:  unique texts the caller has to encode (None if the vectors are already known)
+# vectors:     vectors resolved without the model (cache hits)
+# source_rows: buffer rows to copy the vectors from (duplicates of rows already written)
+# take:        for every entry of rows, the index into the vectors that belongs there
+Batch = namedtuple('Batch', ['rows', 'texts', 'keys', 'vectors', 'source_rows', 'take'])
+
+# Texts remembered for in-run deduplication once their batch has been handed out. Each
+# entry takes about 150 bytes, so this caps the map at a few hundred MB however large the
+# input is; repeats of a text that has been forgotten are encoded again (or found in the
+# cache).
+MAX_WRITTEN_KEYS = 2_000_000
+
+
+def row_index(rows):
+    # Consecutive, increasing rows become a slice so memmapped buffers are written
+    # sequentially. The source rows of copies follow input order, so a permutation of a
+    # range (e.g. [0, 2, 1, 3]) must stay a list.
+    rows = np.asarray(rows)
+    if len(rows) and np.all(np.diff(rows) == 1):
+        return slice(int(rows[0]), int(rows[-1]) + 1)
+    return rows
+
+
+class BatchScheduler:
+    """Turns a stream of texts into the batches that actually have to go through the model.
+
+    Cache hits and repeats of texts already seen in this run are resolved without the
+    model, and every unique text is only encoded once. Rows are only handed out once, so
+    ``processed_rows`` is exact as soon as the caller has written the batch it was given.
+
+    With ``sort_by_length`` (or a ``max_batch_tokens`` budget) texts are collected into a
+    window of ``sort_window`` batches and regrouped so that each batch holds texts of
+    similar length, which keeps padding to a minimum. ``length_function`` maps a list of
+    texts to their lengths in tokens; it defaults to the character count.
+
+    Texts waiting for a batch are bounded by the window; of the texts already handed out,
+    the ``max_written_keys`` most recently seen are remembered for deduplication.
+    """
+
+    def __init__(self, texts, batch_size, start_row=0, cache=None, model_name=None, deduplicate=True,
+                 sort_by_length=False, max_batch_tokens=None, length_function=None, sort_window=64,
+                 max_written_keys=MAX_WRITTEN_KEYS):
+        self.texts = texts
+        self.batch_size = batch_size
+        self.cache = cache
+        self.model_name = model_name
+        self.deduplicate = deduplicate
+        self.sort_by_length = sort_by_length
+        self.max_batch_tokens = max_batch_tokens
+        self.length_function = length_function or (lambda texts: [len(text) for text in texts])
+        self.window_size = batch_size * sort_window if sort_by_length or max_batch_tokens else None
+        self.window_min_row = None
+        self.rows_read = start_row
+        self.duplicate_rows = 0
+        # Each pending entry is [key, text, rows]; repeats of a pending text join its rows.
+        self.pending = []
+        self.pending_by_key = {}
+        self.pending_row_count = 0
+        self.written_by_key = OrderedDict()
+        self.max_written_keys = max_written_keys
+        self.in_flight_rows = None
+
+    @property
+    def processed_rows(self):
+        return self.rows_read - self.pending_row_count
+
+    @property
+    def committed_rows(self):
+        # Every row below this one has been written by the caller; the batch it is
+        # currently holding only counts once it asks for the next one.
+        candidates = [self.rows_read]
+        if self.pending:
+            candidates.append(self.pending[0][2][0])
+        if self.in_flight_rows:
+            candidates.append(min(self.in_flight_rows))
+        if self.window_min_row is not None:
+            candidates.append(self.window_min_row)
+        return min(candidates)
+
+    def __iter__(self):
+        for batch in self._schedule():
+            self.in_flight_rows = batch.rows
+            yield batch
+            self.in_flight_rows = None
+
+    def _schedule(self):
+        use_keys = self.cache is not None or self.deduplicate
+
+        for chunk in iter_batches(self.texts, self.batch_size):
+            start = self.rows_read
+            self.rows_read += len(chunk)
+            rows = range(start, self.rows_read)
+
+            if not use_keys:
+                self._add_pending([[None, text, [row]] for row, text in zip(rows, chunk)])
+            else:
+                keys = [text_key(text) for text in chunk]
+                copy_rows, source_rows, lookups = [], [], []
+                for row, text, key in zip(rows, chunk, keys):
+                    if self.deduplicate and key in self.pending_by_key:
+                        self.pending_by_key[key][2].append(row)
+                        self.pending_row_count += 1
+                        self.duplicate_rows += 1
+                    elif self.deduplicate and key in self.written_by_key:
+                        self.written_by_key.move_to_end(key)
+                        copy_rows.append(row)
+                        source_rows.append(self.written_by_key[key])
+                        self.duplicate_rows += 1
+                    else:
+                        lookups.append((row, text, key))
+
+                if copy_rows:
+                    yield Batch(copy_rows, None, None, None, source_rows, None)
+
+                cached = [None] * len(lookups)
+                if self.cache is not None and lookups:
+                    cached = self.cache.get_many(self.model_name, [key for _, _, key in lookups])
+
+                hit_rows, hit_vectors, misses = [], [], []
+                for (row, text, key), vector in zip(lookups, cached):
+                    if vector is not None:
+                        hit_rows.append(row)
+                        hit_vectors.append(vector)
+                        self._mark_written(key, row)
+                    elif self.deduplicate and key in self.pending_by_key:
+                        # Repeated within this chunk.
+                        self.pending_by_key[key][2].append(row)
+                        self.pending_row_count += 1
+                        self.duplicate_rows += 1
+                    else:
+                        entry = [key, text, [row]]
+                        misses.append(entry)
+                        if self.deduplicate:
+                            self.pending_by_key[key] = entry
+
+                if hit_rows:
+                    yield Batch(hit_rows, None, None, np.stack(hit_vectors), None, None)
+                self._add_pending(misses)
+
+            if self.window_size is None:
+                while len(self.pending) >= self.batch_size:
+                    yield self._take(self.batch_size)
+            elif len(self.pending) >= self.window_size:
+                yield from self._flush_window()
+
+        if self.window_size is None:
+            while self.pending:
+                yield self._take(self.batch_size)
+        elif self.pending:
+            yield from self._flush_window()
+
+    def _flush_window(self):
+        window, self.pending = self.pending, []
+        lengths = self.length_function([text for _, text, _ in window])
+        self.window_min_row = min(rows[0] for _, _, rows in window)
+
+        order = range(len(window))
+        if self.sort_by_length:
+            # Longest first, so a batch that does not fit in memory fails straight away.
+            order = sorted(order, key=lengths.__getitem__, reverse=True)
+
+        group = []
+        group_max_length = 0
+        for index in order:
+            length = lengths[index]
+            if group and self._batch_full(len(group), max(group_max_length, length)):
+                yield self._make_batch(group)
+                group, group_max_length = [], 0
+            group.append(window[index])
+            group_max_length = max(group_max_length, length)
+        if group:
+            yield self._make_batch(group)
+
+        self.window_min_row = None
+
+    def _batch_full(self, count, max_length):
+        # Every text in a batch is padded to the longest one, so that is what the budget counts.
+        if self.max_batch_tokens:
+            return (count + 1) * max_length > self.max_batch_tokens
+        return count >= self.batch_size
+
+    def _add_pending(self, entries):
+        self.pending.extend(entries)
+        self.pending_row_count += sum(len(rows) for _, _, rows in entries)
+
+    def _take(self, size):
+        entries = self.pending[:size]
+        del self.pending[:size]
+        return self._make_batch(entries)
+
+    def _make_batch(self, entries):
+        rows, take = [], []
+        for index, (key, _, entry_rows) in enumerate(entries):
+            rows.extend(entry_rows)
+            take.extend([index] * len(entry_rows))
+            self.pending_row_count -= len(entry_rows)
+            if key is not None:
+                self.pending_by_key.pop(key, None)
+                self._mark_written(key, entry_rows[0])
+
+        texts = [text for _, text, _ in entries]
+        keys = [key for key, _, _ in entries] if entries[0][0] is not None else None
+        if len(rows) == len(entries) and all(a < b for a, b in zip(rows, rows[1:])):
+            return Batch(rows, texts, keys, None, None, None)
+
+        order = np.argsort(rows, kind='stable')
+        return Batch([rows[i] for i in order], texts, keys, None, None, np.asarray(take)[order])
+
+    def _mark_written(self, key, row):
+        if self.deduplicate:
+            self.written_by_key[key] = row
+            if len(self.written_by_key) > self.max_written_keys:
+                self.written_by_key.popitem(last=False)
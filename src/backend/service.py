@@ -0,0 +1,327 @@
+import json
+import time
+import uuid
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.engine import EmbeddingEngine
+from backend.batcher import MicroBatcher, LatencyStats, MAX_BATCH_SIZE, MAX_WAIT_MS
+from backend.registry import registry
+from backend.pool import LocalEncoder
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+MAX_TEXTS_PER_REQUEST = 4096
+MAX_BODY_BYTES = 64 * 1024**2
+REQUEST_TIMEOUT = 300
+# Finished jobs kept for GET /jobs; older ones are dropped as new jobs come in.
+MAX_FINISHED_JOBS = 100
+MAX_JOB_WARNINGS = 100
+# embed_file arguments a job can't set; the service fills them in itself.
+JOB_ARGUMENTS = ('input_file_path', 'output_directory', 'model_name', 'output_name', 'output_format', 'batch_size')
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    def __init__(self, job_id, input_file, output_dir, model_name, output_name, output_format, batch_size, options):
+        self.id = job_id
+        self.input_file = input_file
+        self.output_dir = output_dir
+        self.model_name = model_name
+        self.output_name = output_name
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.options = options
+        self.status = 'queued'
+        self.progress = {}
+        self.output_file = None
+        self.error = None
+        self.warnings = []
+        self.cancelled = False
+        self._last_message = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.engine = EmbeddingEngine(on_progress=self._on_progress, on_error=self._on_error)
+
+    def _on_progress(self, stats):
+        self.progress = stats
+
+    def _on_error(self, message):
+        # Failed batches are reported while the run carries on; whatever ends the run is
+        # reported last and becomes ``error`` once embed_file has returned.
+        self._last_message = message
+        if len(self.warnings) < MAX_JOB_WARNINGS:
+            self.warnings.append(message)
+
+    def run(self):
+        if self.cancelled:
+            return
+        self.status = 'running'
+        self.started_at = time.time()
+        try:
+            result = self.engine.embed_file(self.input_file, self.output_dir, self.model_name, self.output_name,
+                                            self.output_format, self.batch_size, **self.options)
+        except Exception as e:
+            result = None
+            self.error = str(e)
+        if result:
+            self.output_file, self.progress = result
+            self.status = 'completed'
+        else:
+            if self.error is None and self._last_message is not None:
+                self.error = self._last_message
+                if self.warnings and self.warnings[-1] is self._last_message:
+                    self.warnings.pop()
+            self.status = 'cancelled' if self.cancelled or self.engine.cancel_flag else 'failed'
+        self.finished_at = time.time()
+
+    def cancel(self):
+        if self.status in ('queued', 'running'):
+            self.cancelled = True
+            self.engine.cancel_embedding()
+            if self.status == 'queued':
+                self.status = 'cancelled'
+                self.finished_at = time.time()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "input_file": self.input_file,
+            "model_name": self.model_name,
+            "output_format": self.output_format,
+            "output_file": self.output_file,
+            "progress": self.progress,
+            "error": self.error,
+            "warnings": list(self.warnings),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class EmbeddingService:
+    """The embedding backend behind a long-running local HTTP API.
+
+    Models stay loaded in the shared registry between requests. ``/embed`` requests for
+    the same model go through one MicroBatcher, so concurrent small requests are encoded
+    together. The batchers tokenize with their own tokenizer copies (see LocalEncoder),
+    because a job may be using the shared model's tokenizer at the same time. File jobs posted to ``/jobs`` run one at a time on a background thread
+    with the regular embed_file pipeline.
+    """
+
+    def __init__(self, default_model=DEFAULT_MODEL, device=None, max_batch_size=MAX_BATCH_SIZE,
+                 max_wait_ms=MAX_WAIT_MS):
+        self.default_model = default_model
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batchers = {}
+        self.encoders = {}
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.job_executor = ThreadPoolExecutor(1, thread_name_prefix='job')
+        self.request_latency = LatencyStats()
+        self.started_at = time.time()
+
+    def warm_up(self, model_names):
+        for model_name in model_names:
+            self.batcher(model_name)
+
+    def batcher(self, model_name):
+        with self.lock:
+            batcher = self.batchers.get(model_name)
+        if batcher is None:
+            # Loading happens outside the lock so requests for warm models aren't held up.
+            model, _ = registry.get(model_name, self.device)
+            with self.lock:
+                batcher = self.batchers.get(model_name)
+                if batcher is None:
+                    encoder = self.encoders[model_name] = LocalEncoder(model, tokenizer_threads=1)
+                    encode = lambda texts: encoder.submit(texts).result()
+                    batcher = self.batchers[model_name] = MicroBatcher(encode, self.max_batch_size,
+                                                                       self.max_wait_ms)
+        return batcher
+
+    def embed(self, texts, model_name=None):
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            raise RequestError(400, "'texts' must be a list of strings")
+        if not texts:
+            raise RequestError(400, "'texts' is empty")
+        if len(texts) > MAX_TEXTS_PER_REQUEST:
+            raise RequestError(413, f"At most {MAX_TEXTS_PER_REQUEST} texts per request; use /jobs for files")
+        model_name = model_name or self.default_model
+        try:
+            batcher = self.batcher(model_name)
+        except Exception as e:
+            raise RequestError(400, f"Could not load {model_name}: {e}")
+        vectors = batcher.submit(texts).result(REQUEST_TIMEOUT)
+        return model_name, vectors
+
+    def submit_job(self, request):
+        input_file = request.get('input')
+        output_dir = request.get('output_dir')
+        if not isinstance(input_file, str) or not isinstance(output_dir, str):
+            raise RequestError(400, "'input' and 'output_dir' are required")
+        options = request.get('options', {})
+        if not isinstance(options, dict):
+            raise RequestError(400, "'options' must be an object")
+        parameters = inspect.signature(EmbeddingEngine.embed_file).parameters
+        unknown = [key for key in options if key not in parameters or key in JOB_ARGUMENTS]
+        if unknown:
+            raise RequestError(400, f"Unknown job options: {', '.join(unknown)}")
+
+        job = Job(uuid.uuid4().hex[:12], input_file, output_dir, request.get('model') or self.default_model,
+                  request.get('output_name') or 'embeddings', request.get('format', 'npy'),
+                  request.get('batch_size', 32), options)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._prune_jobs()
+        self.job_executor.submit(job.run)
+        return job
+
+    def _prune_jobs(self):
+        # Called with the lock held. Queued and running jobs are always kept.
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job_id]
+
+    def job(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise RequestError(404, f"No job {job_id}")
+        return job
+
+    def list_jobs(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def stats(self):
+        with self.lock:
+            batchers = dict(self.batchers)
+            jobs = list(self.jobs.values())
+        job_counts = {}
+        for job in jobs:
+            job_counts[job.status] = job_counts.get(job.status, 0) + 1
+        return {
+            "uptime": time.time() - self.started_at,
+            "queue_depth": sum(batcher.stats()["queue_depth"] for batcher in batchers.values()),
+            "request_latency": self.request_latency.summary(),
+            "models": {model_name: batcher.stats() for model_name, batcher in batchers.items()},
+            "model_memory_mb": registry.memory_usage() / 1024**2,
+            "jobs": job_counts,
+        }
+
+    def close(self):
+        for job in self.list_jobs():
+            job.cancel()
+        self.job_executor.shutdown(wait=True)
+        with self.lock:
+            batchers = list(self.batchers.values())
+            encoders = list(self.encoders.values())
+        for batcher in batchers:
+            batcher.close()
+        for encoder in encoders:
+            encoder.close()
+
+
+class EmbeddingRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'Embeddium'
+    # Set on the handler class by make_server().
+    service = None
+
+    def log_message(self, format, *args):
+        # Requests are counted in /stats; per-request lines would flood the console.
+        pass
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def do_DELETE(self):
+        self._handle(self._delete)
+
+    def _get(self, path):
+        if path == '/health':
+            return 200, {"status": "ok"}
+        elif path == '/stats':
+            return 200, self.service.stats()
+        elif path == '/jobs':
+            return 200, {"jobs": [job.to_dict() for job in self.service.list_jobs()]}
+        elif path.startswith('/jobs/'):
+            return 200, self.service.job(path[len('/jobs/'):]).to_dict()
+        raise RequestError(404, f"Not found: {path}")
+
+    def _post(self, path):
+        request = self._read_json()
+        if path == '/embed':
+            start_time = time.perf_counter()
+            model_name, vectors = self.service.embed(request.get('texts'), request.get('model'))
+            latency = time.perf_counter() - start_time
+            self.service.request_latency.add(latency)
+            return 200, {
+                "model": model_name,
+                "dim": int(vectors.shape[1]),
+                "embeddings": vectors.tolist(),
+                "latency_ms": latency * 1000,
+            }
+        elif path == '/jobs':
+            return 202, self.service.submit_job(request).to_dict()
+        raise RequestError(404, f"Not found: {path}")
+
+    def _delete(self, path):
+        if path.startswith('/jobs/'):
+            job = self.service.job(path[len('/jobs/'):])
+            job.cancel()
+            return 200, job.to_dict()
+        raise RequestError(404, f"Not found: {path}")
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, "Request body too large")
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            raise RequestError(400, "The request body isn't valid JSON")
+        if not isinstance(request, dict):
+            raise RequestError(400, "The request body must be a JSON object")
+        return request
+
+    def _handle(self, method):
+        path = self.path.split('?', 1)[0].rstrip('/') or '/'
+        try:
+            status, body = method(path)
+        except RequestError as e:
+            status, body = e.status, {"error": str(e)}
+        except Exception as e:
+            status, body = 500, {"error": f"An error occurred: {e}"}
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class EmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 resets connections when a burst of clients arrives.
+    request_queue_size = 128
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    handler = type('Handler', (EmbeddingRequestHandler,), {'service': service})
+    return EmbeddingServer((host, port), handler)
@@ -0,0 +1,62 @@
+import os
+import json
+
+import numpy as np
+
+from backend import quantize
+
+MANIFEST_SUFFIX = '.manifest.json'
+SHARD_SIZES = {
+    None: "Single file",
+    256: "256 MB shards",
+    1024: "1 GB shards",
+    4096: "4 GB shards",
+}
+
+
+def manifest_path(output_directory, output_name):
+    return os.path.join(output_directory, f"{output_name}{MANIFEST_SUFFIX}")
+
+
+def shard_file_name(output_name, shard_index, output_format):
+    return f"{output_name}-{shard_index:05d}.{output_format}"
+
+
+def rows_per_shard(embedding_dim, precision, shard_rows=None, shard_size_mb=None):
+    """Rows in every shard but the last, whichever of the two limits is hit first."""
+    limits = []
+    if shard_rows:
+        limits.append(shard_rows)
+    if shard_size_mb:
+        # Sized on the stored vectors; file headers and compression move it a little.
+        limits.append(int(shard_size_mb * 1024**2) // quantize.vector_size(embedding_dim, precision))
+    return max(1, min(limits))
+
+
+def shard_ranges(total_rows, shard_rows):
+    return [(start, min(start + shard_rows, total_rows)) for start in range(0, total_rows, shard_rows)]
+
+
+def is_manifest(path):
+    return path.endswith(MANIFEST_SUFFIX)
+
+
+def write_manifest(path, manifest):
+    # Written last and atomically, so a manifest only ever lists complete shards.
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def read_manifest(path):
+    with open(path) as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(os.path.abspath(path))
+    for shard in manifest["shards"]:
+        shard["path"] = os.path.join(directory, shard["file"])
+    return manifest
+
+
+def storage_dtype(precision):
+    return np.dtype(quantize.STORAGE_DTYPES[precision]).name
@@ -0,0 +1,74 @@
+import numpy as np
+
+from backend.cache import text_key
+
+HDF5_COMPRESSIONS = {
+    None: "None",
+    'lzf': "LZF (fast)",
+    'gzip': "GZIP (smaller)",
+}
+GZIP_LEVEL = 4
+# Aim for chunks of about 1 MB: big enough to compress well, small enough that reading
+# a few rows doesn't decompress much more than it needs.
+HDF5_CHUNK_BYTES = 1024 * 1024
+TEXT_HASH_SIZE = 16
+
+
+def text_hashes(texts):
+    return np.frombuffer(b''.join(text_key(text) for text in texts), dtype=np.uint8).reshape(-1, TEXT_HASH_SIZE)
+
+
+class HDF5Writer:
+    """Appends embeddings to a resizable, chunked (optionally compressed) HDF5 dataset.
+
+    Next to ``embeddings`` the file holds ``row_ids`` (the input row of every vector) and,
+    when given, ``text_hashes`` (the 16-byte cache key of its text), so downstream readers
+    can slice or match rows without loading the vectors. ``attrs`` become attributes of
+    the file (model info) and ``dataset_attrs`` of the embeddings dataset (precision).
+    ``expected_rows`` only caps the chunk size, so small files don't allocate 1 MB chunks.
+    """
+
+    def __init__(self, path, dim, dtype=np.float32, compression=None, attrs=None, dataset_attrs=None,
+                 expected_rows=None):
+        import h5py
+
+        if compression not in HDF5_COMPRESSIONS:
+            raise ValueError(f"Unsupported HDF5 compression: {compression}")
+        options = {"compression": compression}
+        if compression == 'gzip':
+            options["compression_opts"] = GZIP_LEVEL
+
+        chunk_rows = max(1, HDF5_CHUNK_BYTES // (dim * np.dtype(dtype).itemsize))
+        if expected_rows:
+            chunk_rows = min(chunk_rows, expected_rows)
+        self.file = h5py.File(path, 'w')
+        self.rows = 0
+        self.embeddings = self.file.create_dataset(
+            'embeddings', shape=(0, dim), maxshape=(None, dim), chunks=(chunk_rows, dim), dtype=dtype, **options)
+        self.row_ids = self.file.create_dataset(
+            'row_ids', shape=(0,), maxshape=(None,), chunks=(chunk_rows,), dtype=np.int64, **options)
+        self.text_hashes = None
+
+        for key, value in (attrs or {}).items():
+            self.file.attrs[key] = value
+        for key, value in (dataset_attrs or {}).items():
+            self.embeddings.attrs[key] = value
+
+    def append(self, vectors, row_ids, hashes=None):
+        start, end = self.rows, self.rows + len(vectors)
+        self.embeddings.resize(end, axis=0)
+        self.embeddings[start:end] = vectors
+        self.row_ids.resize(end, axis=0)
+        self.row_ids[start:end] = row_ids
+
+        if hashes is not None:
+            if self.text_hashes is None:
+                self.text_hashes = self.file.create_dataset(
+                    'text_hashes', shape=(start, TEXT_HASH_SIZE), maxshape=(None, TEXT_HASH_SIZE),
+                    chunks=self.row_ids.chunks + (TEXT_HASH_SIZE,), dtype=np.uint8)
+            self.text_hashes.resize(end, axis=0)
+            self.text_hashes[start:end] = hashes
+        self.rows = end
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,236 @@
+# coding: utf-8
+
+"""
+Embeddium - Command Line Interface
+
+Runs the same read/encode/save pipeline as the desktop application without
+importing Qt, so it can be used on headless servers. Progress is written to
+stdout as one JSON object per line.
+
+Usage:
+    python cli.py embed --input data.csv --model all-MiniLM-L6-v2 --format npy
+    python cli.py embed --input data_dir --combine --format hdf5
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+import multiprocessing
+
+# These modules only need numpy at import time; the engine itself is imported after parsing.
+from backend.faiss_index import FAISS_INDEX_TYPES, FAISS_METRICS
+from backend.quantize import PRECISIONS
+from backend.writers import HDF5_COMPRESSIONS
+from backend.onnx_backend import INFERENCE_BACKENDS
+
+OUTPUT_FORMATS = ['pt', 'npy', 'hdf5', 'faiss']
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='embeddium', description='Generate vector embeddings from the command line.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    embed = subparsers.add_parser('embed', help='Embed input files')
+    embed.add_argument('--input', required=True, action='append',
+                       help='Input file (.txt, .csv, .json, .jsonl or .xlsx) or directory; repeat for several')
+    embed.add_argument('--combine', action='store_true',
+                       help='Write several inputs to one output, with a file index, instead of one output each')
+    embed.add_argument('--model', default='all-MiniLM-L6-v2', help='sentence-transformers model name or path')
+    embed.add_argument('--format', default='npy', choices=OUTPUT_FORMATS, help='Output format')
+    embed.add_argument('--precision', default='float32', choices=list(PRECISIONS),
+                       help='Storage precision for pt, npy and hdf5 (int8 and binary are quantized)')
+    embed.add_argument('--compression', choices=[compression for compression in HDF5_COMPRESSIONS if compression],
+                       help='Compress the hdf5 output')
+    embed.add_argument('--index-type', default='flat', choices=list(FAISS_INDEX_TYPES), help='FAISS index to build (faiss format only)')
+    embed.add_argument('--metric', default='l2', choices=list(FAISS_METRICS),
+                       help='FAISS distance; ip (inner product) suits models with normalized embeddings')
+    embed.add_argument('--output-dir', default='.', help='Directory to write the output to')
+    embed.add_argument('--output-name', default='embeddings', help='Output file name without extension')
+    embed.add_argument('--shard-rows', type=int, help='Start a new output shard every N rows')
+    embed.add_argument('--shard-size-mb', type=float, help='Start a new output shard every N MB')
+    embed.add_argument('--batch-size', type=parse_batch_size, default=32,
+                       help="Texts per batch, or 'auto' to tune it once per model and device")
+    embed.add_argument('--max-batch-tokens', type=int, help='Size batches by total tokens instead of rows')
+    embed.add_argument('--backend', default='torch', choices=list(INFERENCE_BACKENDS),
+                       help='Inference backend; onnx and onnx-int8 export the model once and run it with ONNX Runtime on the CPU')
+    embed.add_argument('--device', action='append',
+                       help='cpu, cuda, cuda:1, ...; repeat to shard batches across several devices')
+    embed.add_argument('--workers', type=int, default=1,
+                       help='Number of worker processes per device (useful for CPU-only machines)')
+    embed.add_argument('--columns', type=parse_columns,
+                       help='Comma-separated table columns to embed, by name or 0-based position (default: all)')
+    embed.add_argument('--separator', default=' ', help='String placed between the columns of a row')
+    embed.add_argument('--header', action='store_true', help='The first row of the table holds column names')
+    embed.add_argument('--append', action='store_true',
+                       help='Update an existing output, only embedding rows whose text is new or changed')
+    embed.add_argument('--no-resume', action='store_true', help='Ignore and do not write checkpoints')
+    embed.add_argument('--no-cache', action='store_true', help='Do not use the on-disk embedding cache')
+    embed.add_argument('--no-dedup', action='store_true', help='Encode repeated texts every time')
+    embed.add_argument('--no-sort', action='store_true', help='Batch texts in file order')
+
+    benchmark = subparsers.add_parser('benchmark', help='Measure encoding throughput on this machine')
+    benchmark.add_argument('--models', type=parse_list, help='Comma-separated models (default: every model in the app)')
+    benchmark.add_argument('--batch-sizes', type=parse_int_list, default=[16, 32, 64, 128])
+    benchmark.add_argument('--threads', type=parse_int_list, help='Comma-separated torch thread counts (default: current)')
+    benchmark.add_argument('--device', action='append', help='cpu, cuda, cuda:1, ...; repeat to compare devices')
+    benchmark.add_argument('--backend', action='append', choices=list(INFERENCE_BACKENDS),
+                           help='torch, onnx or onnx-int8; repeat to compare backends (default: torch)')
+    benchmark.add_argument('--corpus', help='Sample the sentences from this input file instead of generating them')
+    benchmark.add_argument('--samples', type=int, default=1000, help='Number of sentences per run')
+    benchmark.add_argument('--report', default='benchmark_results.json',
+                           help='Report path, .json or .csv; the app shows speeds from benchmark_results.json')
+
+    serve = subparsers.add_parser('serve', help='Run a local HTTP embedding service')
+    serve.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: localhost only)')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--model', action='append',
+                       help='Model to load at startup; the first one is the default for requests without one')
+    serve.add_argument('--device', help='cpu, cuda, cuda:1, ...')
+    serve.add_argument('--max-batch-size', type=int, default=64, help='Most texts encoded together')
+    serve.add_argument('--max-wait-ms', type=float, default=10,
+                       help='Longest a request waits for others to share its batch')
+
+    return parser
+
+
+def parse_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_int_list(value):
+    return [int(item) for item in parse_list(value)]
+
+
+def parse_batch_size(value):
+    return value if value == 'auto' else int(value)
+
+
+def parse_columns(value):
+    return [int(column) if column.strip().isdigit() else column.strip() for column in value.split(',')]
+
+
+def emit(event, **fields):
+    print(json.dumps({"event": event, **fields}), flush=True)
+
+
+def embed(args):
+    # Imported here so that argument errors and --help never pay for the backend imports.
+    from backend.engine import EmbeddingEngine
+    from backend.job_queue import JobQueue
+
+    for input_path in args.input:
+        if not os.path.exists(input_path):
+            emit('error', message=f"Input not found: {input_path}")
+            return 2
+
+    devices = args.device
+    if args.workers > 1:
+        devices = (devices or ['cpu']) * args.workers
+
+    options = dict(
+        resume=not args.no_resume,
+        use_cache=not args.no_cache,
+        deduplicate=not args.no_dedup,
+        sort_by_length=not args.no_sort,
+        max_batch_tokens=args.max_batch_tokens,
+        devices=devices,
+        columns=args.columns,
+        separator=args.separator,
+        header=args.header,
+        index_type=args.index_type,
+        metric=args.metric,
+        precision=args.precision,
+        compression=args.compression,
+        shard_rows=args.shard_rows,
+        shard_size_mb=args.shard_size_mb,
+        append=args.append,
+        inference_backend=args.backend,
+    )
+    callbacks = dict(
+        on_progress=lambda stats: emit('progress', **stats),
+        on_completed=lambda output_file, stats: emit('completed', **stats),
+        on_error=lambda message: emit('error', message=message),
+    )
+
+    try:
+        if len(args.input) == 1 and os.path.isfile(args.input[0]):
+            engine = EmbeddingEngine(**callbacks)
+            # Ctrl+C cancels cleanly so that the checkpoint is committed for the next run.
+            signal.signal(signal.SIGINT, lambda signum, frame: engine.cancel_embedding())
+            result = engine.embed_file(args.input[0], args.output_dir, args.model, args.output_name, args.format,
+                                       args.batch_size, **options)
+        else:
+            queue = JobQueue(args.input, args.output_dir, args.model, args.output_name, args.format, args.batch_size,
+                             combine=args.combine, on_job_finished=lambda job: emit('job', **job),
+                             **callbacks, **options)
+            signal.signal(signal.SIGINT, lambda signum, frame: queue.cancel())
+            result = queue.run()
+    except ValueError as e:
+        emit('error', message=str(e))
+        return 2
+    return 0 if result else 1
+
+
+def benchmark(args):
+    from backend import benchmark as benchmarks
+    from backend.registry import AVAILABLE_MODELS
+
+    if args.corpus:
+        if not os.path.isfile(args.corpus):
+            emit('error', message=f"Corpus file not found: {args.corpus}")
+            return 2
+        texts = benchmarks.sample_corpus(args.corpus, args.samples)
+    else:
+        texts = benchmarks.synthetic_corpus(args.samples)
+    if not texts:
+        emit('error', message="No text to benchmark")
+        return 2
+
+    results = benchmarks.run_benchmarks(
+        args.models or AVAILABLE_MODELS, texts, args.batch_sizes, args.threads, args.device,
+        on_result=lambda result: emit('result', **result),
+        on_error=lambda message: emit('error', message=message),
+        backends=args.backend,
+    )
+    benchmarks.write_report(results, args.report)
+    emit('completed', report=os.path.abspath(args.report), runs=len(results))
+    return 0 if results else 1
+
+
+def serve(args):
+    from backend.service import EmbeddingService, make_server
+
+    models = args.model or ['all-MiniLM-L6-v2']
+    service = EmbeddingService(models[0], args.device, args.max_batch_size, args.max_wait_ms)
+    try:
+        service.warm_up(models)
+    except Exception as e:
+        emit('error', message=f"Could not load a model: {e}")
+        return 1
+    server = make_server(service, args.host, args.port)
+    emit('listening', url=f"http://{args.host}:{server.server_port}", models=models)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'embed':
+        return embed(args)
+    elif args.command == 'benchmark':
+        return benchmark(args)
+    elif args.command == 'serve':
+        return serve(args)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -16,8 +16,9 @@ Usage:
 
 import sys
 import os
+import multiprocessing
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QHBoxLayout, QApplication
 
@@ -34,6 +35,9 @@ from scripts.output_options import OutputOptionsWidget
 from scripts.generate_embeddings import GenerateEmbeddingsWidget
 from scripts.settings import SettingsWidget
 
+# Give the first frame time to paint before the ML stack starts loading in the background.
+WARM_UP_DELAY_MS = 500
+
 def resource_path(relative_path):
     try:
         base_path = sys._MEIPASS
@@ -53,6 +57,8 @@ class Window(FramelessWindow):
         setTheme(Theme.DARK)
         setThemeColor('#9b63d9')
 
+        self.warmUpScheduled = False
+
         self.hBoxLayout = QHBoxLayout(self)
         self.navigationBar = NavigationBar(self)
         self.stackWidget = StackedWidget(self)
@@ -69,8 +75,13 @@ class Window(FramelessWindow):
         self.initWindow()
 
         self.fileInputInterface.fileSelected.connect(self.updateFileInfo)
+        self.fileInputInterface.filesSelected.connect(self.updateFilesInfo)
         self.modelSelectionInterface.modelSelected.connect(self.updateModelInfo)
         self.outputOptionsInterface.outputConfigured.connect(self.updateOutputInfo)
+        self.outputOptionsInterface.optionsChanged.connect(self.generateEmbeddingsInterface.applyOutputOptions)
+        self.settingsInterface.settingsApplied.connect(self.generateEmbeddingsInterface.applySettings)
+
+        self.generateEmbeddingsInterface.applyOutputOptions(self.outputOptionsInterface.get_options())
 
         self.updateModelInfo(self.modelSelectionInterface.selected_model)
 
@@ -101,6 +112,9 @@ class Window(FramelessWindow):
     def updateFileInfo(self, file_path, filename):
         self.generateEmbeddingsInterface.updateInfo(inputFile=file_path)
 
+    def updateFilesInfo(self, file_paths):
+        self.generateEmbeddingsInterface.updateInfo(inputFiles=file_paths)
+
     def updateModelInfo(self, model_name):
         self.generateEmbeddingsInterface.updateInfo(model=model_name)
 
@@ -110,6 +124,12 @@ class Window(FramelessWindow):
             outputLocation=output_location
         )
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.warmUpScheduled:
+            self.warmUpScheduled = True
+            QTimer.singleShot(WARM_UP_DELAY_MS, self.generateEmbeddingsInterface.warmUp)
+
     def switchTo(self, widget):
         self.stackWidget.setCurrentWidget(widget)
 
@@ -152,6 +172,8 @@ class Window(FramelessWindow):
         self.navigationBar.setCurrentItem(widget.objectName())
 
 if __name__ == '__main__':
+    # Encoder pool workers are spawned; a frozen build must not relaunch the GUI in them.
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     w = Window()
     w.show()
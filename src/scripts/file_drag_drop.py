@@ -1,18 +1,19 @@
 import os
-import shutil
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QFileDialog
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QDragEnterEvent, QDropEvent
 
 class FileDragDropWidget(QWidget):
     fileDropped = pyqtSignal(str)
+    # Several files, or directories, dropped or selected at once
+    filesDropped = pyqtSignal(list)
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAcceptDrops(True)
         layout = QVBoxLayout(self)
         
-        self.label = QLabel("Drag & Drop File Here\nor Click to Select")
+        self.label = QLabel("Drag & Drop Files or Folders Here\nor Click to Select")
         self.label.setAlignment(Qt.AlignCenter)
         self.label.setStyleSheet("""
             QLabel {
@@ -25,12 +26,13 @@ class FileDragDropWidget(QWidget):
         """)
         layout.addWidget(self.label)
         
-        self.supported_formats = ['.csv', '.json', '.txt', '.xlsx']
+        self.supported_formats = ['.csv', '.json', '.jsonl', '.txt', '.xlsx']
 
     def dragEnterEvent(self, event: QDragEnterEvent):
         if event.mimeData().hasUrls():
-            file_path = event.mimeData().urls()[0].toLocalFile()
-            if os.path.splitext(file_path)[1].lower() in self.supported_formats:
+            paths = [url.toLocalFile() for url in event.mimeData().urls()]
+            if any(os.path.isdir(path) or os.path.splitext(path)[1].lower() in self.supported_formats
+                   for path in paths):
                 event.acceptProposedAction()
                 self.label.setStyleSheet("""
                     QLabel {
@@ -57,32 +59,26 @@ class FileDragDropWidget(QWidget):
 
     def dropEvent(self, event: QDropEvent):
         if event.mimeData().hasUrls():
-            file_path = event.mimeData().urls()[0].toLocalFile()
-            self.process_file(file_path)
+            self.process_paths([url.toLocalFile() for url in event.mimeData().urls()])
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             file_dialog = QFileDialog()
-            file_dialog.setNameFilter("Supported Files (*.csv *.json *.txt *.xlsx)")
-            file_path, _ = file_dialog.getOpenFileName(self, "Select File", "", "Supported Files (*.csv *.json *.txt *.xlsx)")
-            if file_path:
-                self.process_file(file_path)
+            file_dialog.setNameFilter("Supported Files (*.csv *.json *.jsonl *.txt *.xlsx)")
+            file_paths, _ = file_dialog.getOpenFileNames(self, "Select Files", "", "Supported Files (*.csv *.json *.jsonl *.txt *.xlsx)")
+            if file_paths:
+                self.process_paths(file_paths)
+
+    def process_paths(self, paths):
+        if len(paths) == 1 and not os.path.isdir(paths[0]):
+            self.process_file(paths[0])
+        else:
+            self.filesDropped.emit(paths)
 
     def process_file(self, file_path):
-        self.copy_file(file_path)
+        # The file is read in place; FileInputWidget makes a copy only when asked to.
         self.fileDropped.emit(file_path)
 
-    def copy_file(self, file_path):
-        upload_dir = "uploaded_files"
-        os.makedirs(upload_dir, exist_ok=True)
-        filename = os.path.basename(file_path)
-        destination = os.path.join(upload_dir, filename)
-        try:
-            shutil.copy2(file_path, destination)
-            print(f"File saved to: {destination}")
-        except Exception as e:
-            print(f"Error saving file: {str(e)}")
-
     def enterEvent(self, event):
         self.label.setStyleSheet("""
             QLabel {
@@ -1,46 +1,71 @@
 import os
-import shutil
 
-from PyQt5.QtCore import Qt, pyqtSignal
-from PyQt5.QtWidgets import QVBoxLayout, QWidget
+from PyQt5.QtCore import Qt, pyqtSignal, QThread
+from PyQt5.QtWidgets import QVBoxLayout, QWidget, QFileDialog
 
-from qfluentwidgets import TitleLabel, CaptionLabel, SubtitleLabel, InfoBar, InfoBarPosition
+from qfluentwidgets import TitleLabel, CaptionLabel, SubtitleLabel, PushButton, CheckBox, FluentIcon, InfoBar, InfoBarPosition
 
+from backend.inputs import expand_inputs, link_or_copy
 from scripts.file_drag_drop import FileDragDropWidget
 
+class FileCopyWorker(QThread):
+    """Links or copies a file into the upload directory without blocking the GUI."""
+    copied = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, file_path, directory, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.directory = directory
+
+    def run(self):
+        try:
+            self.copied.emit(link_or_copy(self.file_path, self.directory))
+        except Exception as e:
+            self.failed.emit(str(e))
+
 class FileInputWidget(QWidget):
     fileSelected = pyqtSignal(str, str)
+    filesSelected = pyqtSignal(list)
 
     def __init__(self, parent=None):
         super().__init__(parent=parent)
         self.selected_file = None
+        self.copyWorker = None
         layout = QVBoxLayout(self)
         
         titleLabel = TitleLabel("Input your data File")
         layout.addWidget(titleLabel)
 
-        subLabel = CaptionLabel("Accepted file formats: .csv, .json, .txt, .xlsx")
+        subLabel = CaptionLabel("Accepted file formats: .csv, .json, .jsonl, .txt, .xlsx")
         layout.addWidget(subLabel)
 
         self.fileWidget = FileDragDropWidget(self)
         self.fileWidget.fileDropped.connect(self.handle_file_selection)
+        self.fileWidget.filesDropped.connect(self.handle_files_selection)
         layout.addWidget(self.fileWidget)
 
-        self.uploadedFileLabel = SubtitleLabel("No file uploaded")
+        self.selectFolderBtn = PushButton("Select Folder", icon=FluentIcon.FOLDER)
+        self.selectFolderBtn.clicked.connect(self.select_folder)
+        layout.addWidget(self.selectFolderBtn)
+
+        # Files are read where they are; a copy is only kept on request
+        self.keepCopyCheck = CheckBox("Keep a copy in uploaded_files (hard link when possible)")
+        layout.addWidget(self.keepCopyCheck)
+
+        self.uploadedFileLabel = SubtitleLabel("No file selected")
         layout.addWidget(self.uploadedFileLabel)
         
         layout.addStretch(1)
         
         self.setObjectName("FileInput")
 
-        # Create a directory to store uploaded files
         self.upload_dir = os.path.join(os.getcwd(), "uploaded_files")
-        os.makedirs(self.upload_dir, exist_ok=True)
     
     def show_upload_success(self, filename):
         InfoBar.success(
-            title='File Uploaded',
-            content=f"'{filename}' has been uploaded successfully",
+            title='File Selected',
+            content=f"'{filename}' has been selected successfully",
             orient=Qt.Horizontal,
             isClosable=True,
             position=InfoBarPosition.TOP_RIGHT,
@@ -48,29 +73,62 @@ class FileInputWidget(QWidget):
             parent=self
         )    
 
-    def handle_file_selection(self, file_path):
-        self.selected_file = file_path
-        filename = os.path.basename(file_path)
-        self.fileSelected.emit(file_path, filename)
+    def select_folder(self):
+        folder_path = QFileDialog.getExistingDirectory(self, "Select Input Folder")
+        if folder_path:
+            self.handle_files_selection([folder_path])
 
-        # Copy the file to the upload directory
-        destination = os.path.join(self.upload_dir, filename)
-        try:
-            shutil.copy2(file_path, destination)
-            print(f"File saved to: {destination}")
-            self.show_upload_success(filename)
-            self.uploadedFileLabel.setText(f"Uploaded file: {filename}")
-            
-        except Exception as e:
-            print(f"Error saving file: {str(e)}")
-            
-            # Show error notification
+    def handle_files_selection(self, paths):
+        files = expand_inputs(paths)
+        if not files:
             InfoBar.error(
-                title='Upload Failed',
-                content=f"Failed to upload '{filename}': {str(e)}",
+                title='No Supported Files',
+                content="None of the selected files is a .csv, .json, .jsonl, .txt or .xlsx file",
                 orient=Qt.Horizontal,
                 isClosable=True,
                 position=InfoBarPosition.TOP_RIGHT,
                 duration=5000,
                 parent=self
-            )
\ No newline at end of file
+            )
+            return
+        self.selected_file = None
+        self.uploadedFileLabel.setText(f"Selected {len(files)} files")
+        self.filesSelected.emit(files)
+
+    def handle_file_selection(self, file_path):
+        file_path = os.path.abspath(file_path)
+        if self.keepCopyCheck.isChecked():
+            self.uploadedFileLabel.setText(f"Copying file: {os.path.basename(file_path)}")
+            # Parented, so replacing it while a copy runs doesn't destroy the running thread.
+            self.copyWorker = FileCopyWorker(file_path, self.upload_dir, self)
+            self.copyWorker.copied.connect(self.select_file)
+            self.copyWorker.failed.connect(lambda error: self.show_upload_error(file_path, error))
+            self.copyWorker.finished.connect(self.copyWorker.deleteLater)
+            self.copyWorker.start()
+        else:
+            self.select_file(file_path)
+
+    def select_file(self, file_path):
+        self.selected_file = file_path
+        filename = os.path.basename(file_path)
+        self.fileSelected.emit(file_path, filename)
+        self.show_upload_success(filename)
+        self.uploadedFileLabel.setText(f"Selected file: {filename}")
+
+    def show_upload_error(self, file_path, error):
+        filename = os.path.basename(file_path)
+        if self.selected_file:
+            self.uploadedFileLabel.setText(f"Selected file: {os.path.basename(self.selected_file)}")
+        else:
+            self.uploadedFileLabel.setText("No file selected")
+
+        # Show error notification
+        InfoBar.error(
+            title='Upload Failed',
+            content=f"Failed to upload '{filename}': {error}",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP_RIGHT,
+            duration=5000,
+            parent=self
+        )
\ No newline at end of file
@@ -6,7 +6,7 @@ from PyQt5.QtWidgets import QHBoxLayout, QVBoxLayout, QWidget, QGridLayout
 from qfluentwidgets import CardWidget, StrongBodyLabel, BodyLabel, ProgressBar, ProgressRing, PushButton,TeachingTip, InfoBarIcon, TeachingTipTailPosition, InfoBar, InfoBarPosition
 
 from backend.embedding import EmbeddingBackend
-from backend.embedding_worker import EmbeddingWorker
+from backend.embedding_worker import EmbeddingWorker, EmbeddingQueueWorker
 
 class GenerateEmbeddingsWidget(QWidget):
     def __init__(self, parent=None):
@@ -14,8 +14,16 @@ class GenerateEmbeddingsWidget(QWidget):
         self.initUI()
         self.backend = EmbeddingBackend()
         self.worker = None
+        # Absolute path of the selected input file, as it was picked or dropped.
+        self.inputFile = None
+        # Set when several files (or a directory) were selected instead of one file.
+        self.inputFiles = None
+        self.settings = {"batch_size": 32, "max_batch_tokens": None, "devices": None, "inference_backend": 'torch'}
+        self.outputOptions = {}
         self.embedding_in_progress = False
         self.embedding_completed = False
+        # Models are not preloaded until warmUp(), so startup isn't slowed down by torch.
+        self.preloadEnabled = False
 
     def initUI(self):
         layout = QVBoxLayout(self)
@@ -53,6 +61,10 @@ class GenerateEmbeddingsWidget(QWidget):
         progressLayout.addWidget(BodyLabel("Embedding Progress:"))
         progressLayout.addWidget(self.progressBar)
 
+        # Current file of a multi-file run; the ring shows its progress, the bar all files
+        self.jobLabel = BodyLabel("Current File: --")
+        progressLayout.addWidget(self.jobLabel)
+
         # Estimated Time Remaining
         self.timeRemainingLabel = BodyLabel("Estimated Time Remaining: --:--")
         progressLayout.addWidget(self.timeRemainingLabel)
@@ -107,16 +119,50 @@ class GenerateEmbeddingsWidget(QWidget):
 
         self.setObjectName("GenerateEmbeddings")
 
-    def updateInfo(self, inputFile=None, model=None, outputFormat=None, outputLocation=None):
+    def updateInfo(self, inputFile=None, model=None, outputFormat=None, outputLocation=None, inputFiles=None):
         if inputFile is not None:
+            self.inputFile = os.path.abspath(inputFile) if inputFile else None
+            self.inputFiles = None
             self.inputFileLabel.setText(inputFile)
+        if inputFiles is not None:
+            self.inputFile = None
+            self.inputFiles = inputFiles
+            self.inputFileLabel.setText(f"{len(inputFiles)} files")
         if model is not None:
+            modelChanged = model != self.modelLabel.text()
             self.modelLabel.setText(model)
+            if modelChanged:
+                self.preloadModel()
         if outputFormat is not None:
             self.outputFormatLabel.setText(outputFormat if outputFormat else "Not specified")
         if outputLocation is not None:
             self.outputLocationLabel.setText(outputLocation if outputLocation else "Not specified")
 
+    def applySettings(self, settings):
+        self.settings.update(settings)
+        self.preloadModel()
+
+    def applyOutputOptions(self, options):
+        self.outputOptions.update(options)
+
+    def warmUp(self):
+        self.preloadEnabled = True
+        self.preloadModel()
+
+    def preloadModel(self):
+        model = self.modelLabel.text()
+        if self.preloadEnabled and model not in ["", "No model selected"]:
+            self.backend.preload_model(model, self.preloadDevice())
+
+    def preloadDevice(self):
+        # Mirrors how the backend picks the device of its local model copy.
+        devices = self.settings["devices"]
+        if self.settings["inference_backend"] != 'torch':
+            return 'cpu'
+        if not devices:
+            return None
+        return devices[0] if len(devices) == 1 else 'cpu'
+
     def checkAndStartEmbedding(self):
         missing_params = self.getMissingParams()
         if missing_params:
@@ -154,17 +200,26 @@ class GenerateEmbeddingsWidget(QWidget):
     def startEmbedding(self):
         # Only start if all parameters are set
         # Get parameters from other widgets
-        input_file = self.inputFileLabel.text()
+        input_file = self.inputFile
         model = self.modelLabel.text()
         output_format = self.outputFormatLabel.text().lstrip('.')
         output_location = self.outputLocationLabel.text()
-        output_name = "embeddings"  # You can make this configurable if needed
-        batch_size = 32  # You can make this configurable if needed
-
-        if not os.path.isabs(input_file):
-            input_file = os.path.join(os.getcwd(), "uploaded_files", input_file)
-
-        self.worker = EmbeddingWorker(self.backend, input_file, output_location, model, output_name, output_format, batch_size)
+        options = dict(self.outputOptions)
+        output_name = options.pop("output_name", "embeddings")
+        combine = options.pop("combine", False)
+
+        if self.inputFiles:
+            self.worker = EmbeddingQueueWorker(self.inputFiles, output_location, model, output_name, output_format,
+                                               self.settings["batch_size"], combine,
+                                               max_batch_tokens=self.settings["max_batch_tokens"],
+                                               devices=self.settings["devices"],
+                                               inference_backend=self.settings["inference_backend"], **options)
+            self.worker.job_finished.connect(self.jobFinished)
+        else:
+            self.worker = EmbeddingWorker(self.backend, input_file, output_location, model, output_name, output_format,
+                                          self.settings["batch_size"], max_batch_tokens=self.settings["max_batch_tokens"],
+                                          devices=self.settings["devices"],
+                                          inference_backend=self.settings["inference_backend"], **options)
 
         self.worker.progress_updated.connect(self.updateProgress)
         self.worker.embedding_completed.connect(self.embeddingCompleted)
@@ -179,7 +234,7 @@ class GenerateEmbeddingsWidget(QWidget):
         
     def cancelEmbedding(self):
         if self.worker and self.worker.isRunning():
-            self.backend.cancel_embedding()
+            self.worker.cancel()
             self.worker.wait()
         self.embedding_completed = False
         self.resetUI()
@@ -188,6 +243,7 @@ class GenerateEmbeddingsWidget(QWidget):
         if not self.embedding_completed:
             self.progressBar.setValue(0)
             self.progressRing.setValue(0)
+            self.jobLabel.setText("Current File: --")
             self.timeRemainingLabel.setText("Estimated Time Remaining: --:--")
             self.speedLabel.setText("Processing Speed: -- items/s")
             self.memoryLabel.setText("Memory Usage: -- MB")
@@ -209,8 +265,12 @@ class GenerateEmbeddingsWidget(QWidget):
             self.resetUI()
 
     def updateProgress(self, stats):
-        self.progressBar.setValue(int(stats["progress"]))
+        self.progressBar.setValue(int(stats.get("total_progress", stats["progress"])))
         self.progressRing.setValue(int(stats["progress"]))
+        if "job_index" in stats:
+            input_file = stats["input_file"]
+            name = os.path.basename(input_file) if isinstance(input_file, str) else f"{len(input_file)} files"
+            self.jobLabel.setText(f"Current File: {name} ({stats['job_index'] + 1} of {stats['job_count']})")
         self.timeRemainingLabel.setText(f"Estimated Time Remaining: {stats['eta']:.2f}s")
         self.speedLabel.setText(f"Processing Speed: {stats['speed']:.2f} items/s")
         self.memoryLabel.setText(f"Memory Usage: {stats['memory_usage']:.2f} MB")
@@ -219,6 +279,8 @@ class GenerateEmbeddingsWidget(QWidget):
     def embeddingCompleted(self, output_file, stats):
         self.embedding_in_progress = False
         self.embedding_completed = True
+        self.progressBar.setValue(100)
+        self.progressRing.setValue(100)
         
         # Update labels with post-embedding statistics
         self.timeRemainingLabel.setText(f"Total Time: {stats['total_time']:.2f} seconds")
@@ -228,6 +290,9 @@ class GenerateEmbeddingsWidget(QWidget):
         
         # Add new labels for additional post-embedding statistics
         self.outputInfoLabel.setText(f"Output File: {output_file}")
+        if "job_count" in stats:
+            self.outputInfoLabel.setText(
+                f"Output: {output_file} ({stats['completed_jobs']} of {stats['job_count']} jobs completed)")
         self.dimensionLabel.setText(f"Embedding Dimension: {stats['embedding_dim']}")
         self.modelNameLabel.setText(f"Model Used: {stats['model_name']}")
         self.outputSizeLabel.setText(f"Output Size: {stats['output_size']:.2f} MB")
@@ -245,6 +310,20 @@ class GenerateEmbeddingsWidget(QWidget):
             parent=self
         )
 
+    def jobFinished(self, job):
+        if job["status"] == 'failed':
+            input_file = job["input_file"]
+            name = os.path.basename(input_file) if isinstance(input_file, str) else "the combined output"
+            InfoBar.warning(
+                title='File Skipped',
+                content=f"Could not embed {name}: {job['error']}",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP_RIGHT,
+                duration=5000,
+                parent=self
+            )
+
     def showError(self, error_message):
         if not self.embedding_completed:
             self.resetUI()
@@ -5,6 +5,9 @@ from PyQt5.QtWidgets import QLabel, QHBoxLayout, QVBoxLayout, QWidget
 
 from qfluentwidgets import TitleLabel, BodyLabel, DropDownPushButton, CardWidget, FluentIcon, InfoBadge, TextEdit, RoundMenu, Action, InfoBar, InfoBarPosition
 
+from backend.benchmark import measured_speeds
+from backend.registry import AVAILABLE_MODELS
+
 class ModelSelectionWidget(QWidget):
     modelSelected = pyqtSignal(str)
 
@@ -73,23 +76,7 @@ class ModelSelectionWidget(QWidget):
 
     def createModelMenu(self):
         menu = RoundMenu(parent=self.modelDropdown)
-        models = [
-            "all-mpnet-base-v2",
-            "multi-qa-mpnet-base-dot-v1",
-            "all-distilroberta-v1",
-            "all-MiniLM-L12-v2",
-            "multi-qa-distilbert-cos-v1",
-            "all-MiniLM-L6-v2",
-            "multi-qa-MiniLM-L6-cos-v1",
-            "paraphrase-multilingual-mpnet-base-v2",
-            "paraphrase-albert-small-v2",
-            "paraphrase-multilingual-MiniLM-L12-v2",
-            "paraphrase-MiniLM-L3-v2",
-            "distiluse-base-multilingual-cased-v1",
-            "distiluse-base-multilingual-cased-v2"
-        ]
-
-        for model_name in models:
+        for model_name in AVAILABLE_MODELS:
             action = Action(FluentIcon.IOT, model_name)
             action.triggered.connect(lambda checked, m=model_name: self.updateModelInfo(m))
             menu.addAction(action)
@@ -136,6 +123,11 @@ class ModelSelectionWidget(QWidget):
             self.semanticSearchBadge.setText(data[1])
             self.avgPerformanceBadge.setText(data[2])
             self.speedBadge.setText(data[3])
+
+        # Speeds measured on this machine (python cli.py benchmark) replace the published ones
+        measured_speed = measured_speeds().get(model_name)
+        if measured_speed:
+            self.speedBadge.setText(f"{measured_speed:.0f} (measured)")
         
         description = (
             "This model is part of the sentence-transformers collection. "
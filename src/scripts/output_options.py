@@ -1,10 +1,16 @@
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtWidgets import QVBoxLayout, QWidget, QFileDialog
 
-from qfluentwidgets import TitleLabel, BodyLabel, CardWidget, ComboBox, LineEdit, PushButton, FluentIcon, InfoBar, InfoBarPosition
+from qfluentwidgets import TitleLabel, BodyLabel, CardWidget, ComboBox, LineEdit, PushButton, CheckBox, FluentIcon, InfoBar, InfoBarPosition
+
+from backend.faiss_index import FAISS_INDEX_TYPES, FAISS_METRICS
+from backend.quantize import PRECISIONS
+from backend.shards import SHARD_SIZES
+from backend.writers import HDF5_COMPRESSIONS
 
 class OutputOptionsWidget(QWidget):
     outputConfigured = pyqtSignal(str, str)
+    optionsChanged = pyqtSignal(dict)
 
     def __init__(self, parent=None):
         super().__init__(parent=parent)
@@ -13,6 +19,14 @@ class OutputOptionsWidget(QWidget):
 
         self.initUI()
         self.formatCombo.currentIndexChanged.connect(self.update_format)
+        self.indexTypeCombo.currentIndexChanged.connect(self.update_options)
+        self.metricCombo.currentIndexChanged.connect(self.update_options)
+        self.precisionCombo.currentIndexChanged.connect(self.update_options)
+        self.shardCombo.currentIndexChanged.connect(self.update_options)
+        self.compressionCombo.currentIndexChanged.connect(self.update_options)
+        self.nameEdit.textChanged.connect(self.update_options)
+        self.appendCheck.stateChanged.connect(self.update_options)
+        self.combineCheck.stateChanged.connect(self.update_options)
 
         self.selected_format = self.formatCombo.currentText()
         self.outputConfigured.emit(self.selected_format, "")
@@ -34,8 +48,49 @@ class OutputOptionsWidget(QWidget):
         self.formatCombo.addItems([".pt", ".npy", ".hdf5", ".faiss"])
         formatLayout.addWidget(formatLabel)
         formatLayout.addWidget(self.formatCombo)
+
+        # FAISS indexes are always float32, so precision only applies to the other formats
+        self.precisionLabel = BodyLabel("Precision:")
+        self.precisionCombo = ComboBox()
+        for precision, label in PRECISIONS.items():
+            self.precisionCombo.addItem(label, userData=precision)
+        formatLayout.addWidget(self.precisionLabel)
+        formatLayout.addWidget(self.precisionCombo)
+
+        # Compression, only relevant for the .hdf5 format
+        self.compressionLabel = BodyLabel("Compression:")
+        self.compressionCombo = ComboBox()
+        for compression, label in HDF5_COMPRESSIONS.items():
+            self.compressionCombo.addItem(label, userData=compression)
+        self.compressionLabel.setVisible(False)
+        self.compressionCombo.setVisible(False)
+        formatLayout.addWidget(self.compressionLabel)
+        formatLayout.addWidget(self.compressionCombo)
+
+        # Large outputs can be split into several files listed in a manifest
+        self.shardCombo = ComboBox()
+        for shard_size, label in SHARD_SIZES.items():
+            self.shardCombo.addItem(label, userData=shard_size)
+        formatLayout.addWidget(BodyLabel("Split Output:"))
+        formatLayout.addWidget(self.shardCombo)
         layout.addWidget(formatCard)
 
+        # FAISS index, only relevant for the .faiss format
+        self.indexCard = CardWidget(self)
+        indexLayout = QVBoxLayout(self.indexCard)
+        self.indexTypeCombo = ComboBox()
+        for index_type, label in FAISS_INDEX_TYPES.items():
+            self.indexTypeCombo.addItem(label, userData=index_type)
+        self.metricCombo = ComboBox()
+        for metric, label in FAISS_METRICS.items():
+            self.metricCombo.addItem(label, userData=metric)
+        indexLayout.addWidget(BodyLabel("FAISS Index Type:"))
+        indexLayout.addWidget(self.indexTypeCombo)
+        indexLayout.addWidget(BodyLabel("Distance Metric:"))
+        indexLayout.addWidget(self.metricCombo)
+        self.indexCard.setVisible(False)
+        layout.addWidget(self.indexCard)
+
         # Save location
         locationCard = CardWidget(self)
         locationLayout = QVBoxLayout(locationCard)
@@ -49,6 +104,19 @@ class OutputOptionsWidget(QWidget):
         locationLayout.addWidget(locationLabel)
         locationLayout.addWidget(self.locationDisplay)
         locationLayout.addWidget(self.selectLocationBtn)
+
+        self.nameEdit = LineEdit()
+        self.nameEdit.setText("embeddings")
+        locationLayout.addWidget(BodyLabel("Output Name:"))
+        locationLayout.addWidget(self.nameEdit)
+
+        # Re-runs on a grown or edited input only embed the rows that changed
+        self.appendCheck = CheckBox("Update existing output (embed new or changed rows only)")
+        locationLayout.addWidget(self.appendCheck)
+
+        # Only used when several input files are selected; otherwise each gets its own output
+        self.combineCheck = CheckBox("Combine multiple input files into one output (with a file index)")
+        locationLayout.addWidget(self.combineCheck)
         layout.addWidget(locationCard)
 
         layout.addStretch(1)
@@ -75,4 +143,25 @@ class OutputOptionsWidget(QWidget):
     
     def update_format(self, index):
         self.selected_format = self.formatCombo.currentText().lstrip('.')  
-        self.outputConfigured.emit(self.selected_format, self.selected_location or "")
\ No newline at end of file
+        self.indexCard.setVisible(self.selected_format == 'faiss')
+        self.precisionLabel.setVisible(self.selected_format != 'faiss')
+        self.precisionCombo.setVisible(self.selected_format != 'faiss')
+        self.compressionLabel.setVisible(self.selected_format == 'hdf5')
+        self.compressionCombo.setVisible(self.selected_format == 'hdf5')
+        self.update_options(index)
+        self.outputConfigured.emit(self.selected_format, self.selected_location or "")
+
+    def get_options(self):
+        return {
+            "index_type": self.indexTypeCombo.currentData(),
+            "metric": self.metricCombo.currentData(),
+            "precision": self.precisionCombo.currentData() if self.selected_format != 'faiss' else 'float32',
+            "shard_size_mb": self.shardCombo.currentData(),
+            "compression": self.compressionCombo.currentData() if self.selected_format == 'hdf5' else None,
+            "output_name": self.nameEdit.text().strip() or "embeddings",
+            "append": self.appendCheck.isChecked(),
+            "combine": self.combineCheck.isChecked(),
+        }
+
+    def update_options(self, index):
+        self.optionsChanged.emit(self.get_options())
\ No newline at end of file
@@ -1,13 +1,16 @@
+import os
 import platform
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtWidgets import QHBoxLayout, QVBoxLayout, QWidget
 
-from qfluentwidgets import GroupHeaderCardWidget, ComboBox, FluentIcon, PushButton, InfoBar, InfoBarPosition, StrongBodyLabel, CardWidget, HyperlinkButton
+from backend.onnx_backend import INFERENCE_BACKENDS
 
-import torch
+from qfluentwidgets import GroupHeaderCardWidget, ComboBox, FluentIcon, PushButton, InfoBar, InfoBarPosition, StrongBodyLabel, CardWidget, HyperlinkButton
 
 class SettingsWidget(GroupHeaderCardWidget):
+    settingsApplied = pyqtSignal(dict)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setTitle("Computation Device Settings")
@@ -41,6 +44,57 @@ class SettingsWidget(GroupHeaderCardWidget):
             self.deviceListCombo
         )
 
+        # Parallel CPU workers
+        self.workersCombo = ComboBox()
+        cpuCount = os.cpu_count() or 1
+        workerCounts = [n for n in (1, 2, 4, 8, 16, 32) if n < cpuCount] + [cpuCount]
+        self.workersCombo.addItems([str(n) for n in workerCounts])
+        self.workersCombo.setFixedWidth(200)
+
+        self.addGroup(
+            FluentIcon.DEVELOPER_TOOLS,
+            "Parallel Workers",
+            "Number of CPU processes that encode batches side by side",
+            self.workersCombo
+        )
+
+        # Inference backend
+        self.backendCombo = ComboBox()
+        for backend, label in INFERENCE_BACKENDS.items():
+            self.backendCombo.addItem(label, userData=backend)
+        self.backendCombo.setFixedWidth(200)
+
+        self.addGroup(
+            FluentIcon.SPEED_HIGH,
+            "Inference Backend",
+            "ONNX Runtime (CPU only) exports the model once and is often faster; int8 is faster still",
+            self.backendCombo
+        )
+
+        # Batching
+        self.batchSizeCombo = ComboBox()
+        self.batchSizeCombo.addItems(["Auto", "16", "32", "64", "128", "256"])
+        self.batchSizeCombo.setCurrentText("32")
+        self.batchSizeCombo.setFixedWidth(200)
+
+        self.addGroup(
+            FluentIcon.SPEED_HIGH,
+            "Batch Size",
+            "Number of texts sent to the model at once (Auto finds the fastest for your hardware)",
+            self.batchSizeCombo
+        )
+
+        self.tokenBudgetCombo = ComboBox()
+        self.tokenBudgetCombo.addItems(["Off", "4096", "8192", "16384", "32768"])
+        self.tokenBudgetCombo.setFixedWidth(200)
+
+        self.addGroup(
+            FluentIcon.SPEED_HIGH,
+            "Token Budget",
+            "Size batches by total tokens instead of a fixed number of texts",
+            self.tokenBudgetCombo
+        )
+
         self.vBoxLayout.addSpacing(40)
         self.addPersonalInfoSection() 
 
@@ -65,19 +119,46 @@ class SettingsWidget(GroupHeaderCardWidget):
         self.deviceListCombo.clear()
         if self.deviceTypeCombo.currentText() == "CPU":
             cpu_name = platform.processor()
-            self.deviceListCombo.addItem(f"CPU: {cpu_name}")
+            self.deviceListCombo.addItem(f"CPU: {cpu_name}", userData=["cpu"])
         else:
+            # torch takes seconds to import, so it is only loaded once GPUs are asked for.
+            import torch
             if torch.cuda.is_available():
-                for i in range(torch.cuda.device_count()):
-                    self.deviceListCombo.addItem(f"GPU {i}: {torch.cuda.get_device_name(i)}")
+                gpus = [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+                for i, gpu in enumerate(gpus):
+                    self.deviceListCombo.addItem(f"GPU {i}: {torch.cuda.get_device_name(i)}", userData=[gpu])
+                if len(gpus) > 1:
+                    self.deviceListCombo.addItem(f"All GPUs ({len(gpus)})", userData=gpus)
             else:
                 self.deviceListCombo.addItem("No GPU available")
 
+    def getSettings(self):
+        tokenBudget = self.tokenBudgetCombo.currentText()
+        batchSize = self.batchSizeCombo.currentText()
+        devices = self.deviceListCombo.currentData()
+        if devices == ["cpu"]:
+            devices = devices * int(self.workersCombo.currentText())
+        return {
+            "batch_size": 'auto' if batchSize == "Auto" else int(batchSize),
+            "max_batch_tokens": None if tokenBudget == "Off" else int(tokenBudget),
+            "devices": devices,
+            "inference_backend": self.backendCombo.currentData(),
+        }
+
     def applySettings(self):
         deviceType = self.deviceTypeCombo.currentText()
         specificDevice = self.deviceListCombo.currentText()
+        settings = self.getSettings()
         
-        settingsInfo = f"Device: {deviceType} - {specificDevice}"
+        settingsInfo = f"Device: {deviceType} - {specificDevice}, Batch Size: {settings['batch_size']}"
+        if settings["devices"] and len(settings["devices"]) > 1:
+            settingsInfo += f", Workers: {len(settings['devices'])}"
+        if settings["inference_backend"] != 'torch':
+            settingsInfo += f", Backend: {self.backendCombo.currentText()}"
+        if settings["max_batch_tokens"]:
+            settingsInfo += f", Token Budget: {settings['max_batch_tokens']}"
+
+        self.settingsApplied.emit(settings)
         
         InfoBar.success(
             title='Settings Applied',
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+WORDS = "the quick brown fox jumps over lazy dog how do i reset my password a vector search".split()
+
+
+@pytest.fixture(scope='session')
+def tiny_model(tmp_path_factory):
+    """Path of a small, randomly initialised SentenceTransformer built on disk (nothing is downloaded)."""
+    pytest.importorskip('torch')
+    transformers = pytest.importorskip('transformers')
+    sentence_transformers = pytest.importorskip('sentence_transformers')
+
+    transformer_path = str(tmp_path_factory.mktemp('transformer'))
+    vocab_path = os.path.join(transformer_path, 'vocab.txt')
+    with open(vocab_path, 'w') as f:
+        f.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + WORDS) + '\n')
+    transformers.BertTokenizerFast(vocab_path).save_pretrained(transformer_path)
+    config = transformers.BertConfig(vocab_size=5 + len(WORDS), hidden_size=32, num_hidden_layers=1,
+                                     num_attention_heads=2, intermediate_size=64, max_position_embeddings=64)
+    transformers.BertModel(config).save_pretrained(transformer_path)
+
+    models = sentence_transformers.models
+    transformer = models.Transformer(transformer_path, max_seq_length=32)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    model_path = str(tmp_path_factory.mktemp('model'))
+    sentence_transformers.SentenceTransformer(modules=[transformer, pooling], device='cpu').save(model_path)
+    return model_path
@@ -0,0 +1,111 @@
+import time
+import asyncio
+
+import numpy as np
+import pytest
+
+from backend.batcher import AsyncMicroBatcher
+
+
+class Encoder:
+    """Stands in for the model: records every batch and maps a text to its length."""
+
+    def __init__(self, fail_on=None, delay=0.0):
+        self.batches = []
+        self.fail_on = fail_on
+        self.delay = delay
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail_on in texts:
+            raise ValueError(f"cannot encode {self.fail_on}")
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+def test_concurrent_requests_are_coalesced_into_one_batch():
+    encoder = Encoder()
+
+    async def main():
+        batcher = AsyncMicroBatcher(encoder, max_batch_size=64, max_wait_ms=50)
+        requests = [['a'], ['bb', 'ccc'], ['dddd']]
+        results = await asyncio.gather(*(batcher.embed(texts) for texts in requests))
+        await batcher.close()
+        return batcher, results
+
+    batcher, results = asyncio.run(main())
+    assert encoder.batches == [['a', 'bb', 'ccc', 'dddd']]
+    assert [result[:, 0].tolist() for result in results] == [[1], [2, 3], [4]]
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["mean_batch_size"] == 4
+    assert stats["queue_wait"]["count"] == 3
+    assert stats["compute_time"]["count"] == 1
+
+
+def test_a_full_batch_runs_without_waiting():
+    encoder = Encoder()
+
+    async def main():
+        batcher = AsyncMicroBatcher(encoder, max_batch_size=2, max_wait_ms=10000)
+        start = time.perf_counter()
+        await asyncio.gather(batcher.embed(['a']), batcher.embed(['b']), batcher.embed(['c']), batcher.embed(['d']))
+        elapsed = time.perf_counter() - start
+        await batcher.close()
+        return elapsed
+
+    assert asyncio.run(main()) < 5
+    assert encoder.batches == [['a', 'b'], ['c', 'd']]
+
+
+def test_a_lone_request_is_flushed_after_the_max_wait():
+    encoder = Encoder(delay=0.02)
+
+    async def main():
+        batcher = AsyncMicroBatcher(encoder, max_batch_size=64, max_wait_ms=50)
+        start = time.perf_counter()
+        await batcher.embed(['a'])
+        elapsed = time.perf_counter() - start
+        await batcher.close()
+        return batcher, elapsed
+
+    batcher, elapsed = asyncio.run(main())
+    assert elapsed >= 0.05
+    stats = batcher.stats()
+    assert stats["queue_wait"]["mean_ms"] >= 40
+    assert stats["compute_time"]["mean_ms"] >= 15
+    assert sum(stats["queue_wait"]["buckets_ms"].values()) == 1
+
+
+def test_errors_reach_every_request_of_the_batch_and_the_batcher_carries_on():
+    encoder = Encoder(fail_on='bad')
+
+    async def main():
+        batcher = AsyncMicroBatcher(encoder, max_batch_size=64, max_wait_ms=20)
+        results = await asyncio.gather(batcher.embed(['bad']), batcher.embed(['ok']), return_exceptions=True)
+        after = await batcher.embed(['fine'])
+        await batcher.close()
+        return batcher, results, after
+
+    batcher, results, after = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert after[:, 0].tolist() == [4]
+    # Failed batches are not counted as served.
+    assert batcher.stats()["batches"] == 1
+
+
+def test_close_flushes_waiting_requests_and_refuses_new_ones():
+    encoder = Encoder()
+
+    async def main():
+        batcher = AsyncMicroBatcher(encoder, max_batch_size=64, max_wait_ms=10000)
+        request = asyncio.ensure_future(batcher.embed(['a']))
+        await asyncio.sleep(0)
+        await batcher.close()
+        result = await request
+        with pytest.raises(RuntimeError):
+            await batcher.embed(['b'])
+        return result
+
+    assert asyncio.run(main())[:, 0].tolist() == [1]
+    assert encoder.batches == [['a']]
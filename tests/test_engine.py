@@ -0,0 +1,38 @@
+import pytest
+
+from backend import onnx_backend
+from backend.engine import EmbeddingEngine
+from conftest import WORDS
+
+
+def write_texts(path, count):
+    texts = [f"{WORDS[i % len(WORDS)]} {WORDS[i * 7 % len(WORDS)]}" for i in range(count)]
+    path.write_text('\n'.join(texts) + '\n')
+    return texts
+
+
+def test_cache_is_kept_apart_per_inference_backend(tiny_model, tmp_path, monkeypatch):
+    pytest.importorskip('onnxruntime')
+    pytest.importorskip('onnx')
+    monkeypatch.setattr(onnx_backend, 'ONNX_CACHE_DIR', str(tmp_path / 'onnx'))
+    input_path = tmp_path / 'input.txt'
+    texts = write_texts(input_path, 40)
+    distinct = len(set(texts))
+    engine = EmbeddingEngine()
+
+    _, onnx_stats = engine.embed_file(str(input_path), str(tmp_path), tiny_model, 'onnx', 'npy', 8,
+                                      inference_backend='onnx')
+    assert onnx_stats["cache_hits"] == 0
+    assert onnx_stats["cache_misses"] == distinct
+
+    # The torch run finds nothing the ONNX run put in the cache...
+    _, torch_stats = engine.embed_file(str(input_path), str(tmp_path), tiny_model, 'torch', 'npy', 8)
+    assert torch_stats["cache_hits"] == 0
+    assert torch_stats["cache_misses"] == distinct
+
+    # ...but a second run on either backend is served from its own entries.
+    for backend in ('torch', 'onnx'):
+        _, stats = engine.embed_file(str(input_path), str(tmp_path), tiny_model, f'{backend}-again', 'npy', 8,
+                                     inference_backend=backend)
+        assert stats["cache_hits"] == distinct
+        assert stats["cache_misses"] == 0
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from backend import quantize
+from backend.incremental import ExistingOutput, plan_rows, write_hashes
+from backend.writers import HDF5Writer, text_hashes
+
+OLD_TEXTS = ['a', 'b', 'a']
+NEW_TEXTS = OLD_TEXTS + ['c', 'b']
+
+
+def vectors_of(texts):
+    return np.array([[ord(text[0]), len(text)] for text in texts], dtype=np.float32)
+
+
+def update(existing):
+    new_hashes = text_hashes(NEW_TEXTS)
+    plan = existing.plan(new_hashes)
+    assert existing.is_append(new_hashes)
+    existing.update(vectors_of(['c']), plan, new_hashes)
+
+
+def test_rows_are_matched_on_their_text():
+    old = text_hashes(['a', 'b', 'c', 'd'])
+    new = text_hashes(['c', 'a', 'new', 'd', 'b', 'other'])
+    assert plan_rows(old, new).tolist() == [2, 0, -1, 3, 1, -1]
+
+
+def test_grown_input_keeps_every_old_row_in_place():
+    texts = [f"row {i}" for i in range(1000)]
+    plan = plan_rows(text_hashes(texts), text_hashes(texts + ['added 1', 'added 2']))
+    assert plan.tolist() == list(range(1000)) + [-1, -1]
+
+
+def test_repeated_texts_reuse_one_stored_row():
+    plan = plan_rows(text_hashes(['a', 'b', 'a']), text_hashes(['a', 'a', 'b']))
+    assert plan[2] == 1
+    assert plan[0] == plan[1]
+    assert plan[0] in (0, 2)
+
+
+def test_empty_sides_plan_everything_as_new():
+    hashes = text_hashes(['a', 'b'])
+    empty = np.empty((0, hashes.shape[1]), dtype=np.uint8)
+    assert plan_rows(empty, hashes).tolist() == [-1, -1]
+    assert plan_rows(hashes, empty).tolist() == []
+
+
+def test_hashes_larger_than_every_stored_one_are_new():
+    old = text_hashes(['a'])
+    new = np.full((1, old.shape[1]), 255, dtype=np.uint8)
+    assert plan_rows(old, new).tolist() == [-1]
+
+
+def test_input_with_repeats_is_appended_in_place(tmp_path, monkeypatch):
+    path = str(tmp_path / 'embeddings.npy')
+    np.save(path, vectors_of(OLD_TEXTS))
+    write_hashes(path, text_hashes(OLD_TEXTS))
+    existing = ExistingOutput(path, 'npy')
+    monkeypatch.setattr(existing, '_rewrite_npy', None)
+
+    update(existing)
+    np.testing.assert_array_equal(np.load(path), vectors_of(NEW_TEXTS))
+    np.testing.assert_array_equal(np.load(path + '.hashes.npy'), text_hashes(NEW_TEXTS))
+
+
+def test_hdf5_input_with_repeats_is_appended_in_place(tmp_path, monkeypatch):
+    h5py = pytest.importorskip('h5py')
+    path = str(tmp_path / 'embeddings.hdf5')
+    embeddings = vectors_of(OLD_TEXTS)
+    writer = HDF5Writer(path, 2, dataset_attrs=quantize.calibrate(embeddings, 'float32'))
+    writer.append(embeddings, np.arange(len(embeddings)), text_hashes(OLD_TEXTS))
+    writer.close()
+    existing = ExistingOutput(path, 'hdf5')
+    monkeypatch.setattr(existing, '_rewrite_hdf5', None)
+
+    update(existing)
+    with h5py.File(path, 'r') as f:
+        np.testing.assert_array_equal(f['embeddings'][:], vectors_of(NEW_TEXTS))
+        assert f['row_ids'][:].tolist() == list(range(len(NEW_TEXTS)))
+        np.testing.assert_array_equal(f['text_hashes'][:], text_hashes(NEW_TEXTS))
+
+
+def test_edited_rows_are_not_an_append(tmp_path):
+    path = str(tmp_path / 'embeddings.npy')
+    np.save(path, vectors_of(OLD_TEXTS))
+    write_hashes(path, text_hashes(OLD_TEXTS))
+    existing = ExistingOutput(path, 'npy')
+    assert not existing.is_append(text_hashes(['a', 'c', 'a', 'b']))
+    assert not existing.is_append(text_hashes(['a', 'b']))
+
+
+@pytest.mark.parametrize('index_type', ['flat', 'ivf_flat', 'hnsw'])
+def test_faiss_input_with_repeats_is_appended_without_a_rebuild(tmp_path, monkeypatch, index_type):
+    faiss = pytest.importorskip('faiss')
+    from backend import faiss_index
+
+    path = str(tmp_path / 'embeddings.faiss')
+    faiss_index.write_index(vectors_of(OLD_TEXTS), path, index_type)
+    write_hashes(path, text_hashes(OLD_TEXTS))
+    existing = ExistingOutput(path, 'faiss')
+    monkeypatch.setattr(existing, '_rewrite_faiss', None)
+
+    update(existing)
+    index = faiss.read_index(path)
+    assert index.ntotal == len(NEW_TEXTS)
+    _, ids = index.search(vectors_of(['b']), 2)
+    assert sorted(ids[0].tolist()) == [1, 4]
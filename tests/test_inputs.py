@@ -0,0 +1,43 @@
+import os
+
+from backend.inputs import link_or_copy
+
+
+def test_a_different_file_with_the_same_name_is_kept(tmp_path):
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    (uploads / 'data.csv').write_text('queued job\n')
+    source = tmp_path / 'data.csv'
+    source.write_text('new job\n')
+
+    destination = link_or_copy(str(source), str(uploads))
+    assert os.path.basename(destination) == 'data-1.csv'
+    assert (uploads / 'data.csv').read_text() == 'queued job\n'
+    assert (uploads / 'data-1.csv').read_text() == 'new job\n'
+
+
+def test_the_same_file_is_not_stored_twice(tmp_path):
+    uploads = tmp_path / 'uploads'
+    source = tmp_path / 'data.csv'
+    source.write_text('rows\n')
+
+    first = link_or_copy(str(source), str(uploads))
+    assert link_or_copy(str(source), str(uploads)) == first
+    assert os.listdir(uploads) == ['data.csv']
+
+
+def test_copies_are_used_when_links_are_not_possible(tmp_path, monkeypatch):
+    def no_link(source, destination):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(os, 'link', no_link)
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    (uploads / 'data.csv').write_text('queued job\n')
+    source = tmp_path / 'data.csv'
+    source.write_text('new job\n')
+
+    destination = link_or_copy(str(source), str(uploads))
+    assert open(destination).read() == 'new job\n'
+    assert (uploads / 'data.csv').read_text() == 'queued job\n'
+    assert link_or_copy(str(source), str(uploads)) == destination
@@ -0,0 +1,35 @@
+import time
+import threading
+
+from backend.job_queue import JobQueue
+
+
+def test_cancel_while_waiting_for_the_next_file_stops_the_queue(tmp_path, monkeypatch):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"input{index}.txt"
+        path.write_text("some text\n")
+        paths.append(str(path))
+    embedded = []
+    first_job_done = threading.Event()
+    queue = JobQueue(paths, str(tmp_path), 'model', 'output', 'npy', 8)
+
+    def embed_file(input_file, *args, **options):
+        embedded.append(input_file)
+        first_job_done.set()
+        return None
+
+    def prepare(job):
+        # The cancel comes in while the queue waits for the next file to be counted.
+        first_job_done.wait()
+        time.sleep(0.1)
+        queue.cancel()
+
+    monkeypatch.setattr(queue.engine, 'embed_file', embed_file)
+    monkeypatch.setattr(queue, '_prepare', prepare)
+
+    assert queue.run() is None
+    assert embedded == [paths[0]]
+    assert [job.status for job in queue.jobs[1:]] == ['cancelled', 'cancelled']
+    # The engine keeps the cancel, so a run that had already been started would stop too.
+    assert queue.engine.cancel_flag
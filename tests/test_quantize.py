@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from backend import quantize
+
+
+def vectors(rows=100, dim=12):
+    return np.random.default_rng(0).normal(size=(rows, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize('precision, tolerance', [
+    ('float32', 0),
+    ('float16', 1e-3),
+    ('bfloat16', 1e-2),
+])
+def test_float_precisions_round_trip(precision, tolerance):
+    embeddings = vectors()
+    metadata = quantize.calibrate(embeddings, precision)
+    data = quantize.quantize_all(embeddings, metadata)
+
+    assert data.dtype == quantize.STORAGE_DTYPES[precision]
+    assert data.shape == embeddings.shape
+    np.testing.assert_allclose(quantize.dequantize(data, metadata), embeddings, rtol=tolerance, atol=tolerance)
+
+
+def test_int8_round_trip_stays_within_half_a_step():
+    embeddings = vectors()
+    metadata = quantize.calibrate(embeddings, 'int8')
+    restored = quantize.dequantize(quantize.quantize_all(embeddings, metadata), metadata)
+
+    step = np.asarray(metadata["scale"], dtype=np.float32)
+    assert (np.abs(restored - embeddings) <= step / 2 + 1e-6).all()
+    # The extremes of every dimension map onto the ends of the code range.
+    codes = quantize.quantize_all(embeddings, metadata)
+    assert (codes.min(axis=0) == -128).all() and (codes.max(axis=0) == 127).all()
+
+
+def test_int8_restores_constant_dimensions_exactly():
+    embeddings = vectors()
+    embeddings[:, 3] = 0.5
+    metadata = quantize.calibrate(embeddings, 'int8')
+    restored = quantize.dequantize(quantize.quantize_all(embeddings, metadata), metadata)
+    assert (restored[:, 3] == 0.5).all()
+
+
+def test_binary_keeps_the_sign_of_every_dimension():
+    embeddings = vectors(dim=13)
+    metadata = quantize.calibrate(embeddings, 'binary')
+    data = quantize.quantize_all(embeddings, metadata)
+
+    assert data.shape == (100, 2)
+    assert quantize.vector_size(13, 'binary') == 2
+    np.testing.assert_array_equal(quantize.dequantize(data, metadata), (embeddings > 0).astype(np.float32))
+
+
+def test_bfloat16_rounds_to_nearest_even():
+    values = np.array([[1.0, 1 + 2 ** -8, 1 + 3 * 2 ** -8, -2.5]], dtype=np.float32)
+    metadata = quantize.calibrate(values, 'bfloat16')
+    restored = quantize.dequantize(quantize.quantize_all(values, metadata), metadata)
+    assert restored.tolist() == [[1.0, 1.0, 1 + 2 ** -6, -2.5]]
+
+
+@pytest.mark.parametrize('precision', list(quantize.PRECISIONS))
+def test_chunked_conversion_matches_a_single_pass(monkeypatch, precision):
+    embeddings = vectors(rows=103)
+    whole = quantize.quantize(embeddings, quantize.calibrate(embeddings, precision))
+
+    monkeypatch.setattr(quantize, 'CHUNK_SIZE', 10)
+    metadata = quantize.calibrate(embeddings, precision)
+    np.testing.assert_array_equal(quantize.quantize_all(embeddings, metadata), whole)
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from backend import readers
+
+
+def read_json(tmp_path, content):
+    path = tmp_path / 'input.json'
+    path.write_text(content)
+    return list(readers.iter_texts(str(path)))
+
+
+@pytest.mark.parametrize('read_size', [1, 2, 3, 5, 8, 1024])
+@pytest.mark.parametrize('content', [
+    '[1.5, 12345, -3e10, 7, 0.25]',
+    '[12345678901234567890,2.0e-3,-0]',
+    '[{"a": [1, {"b": [2, 3.75]}]}, [[1], []], "x]y,z", {"c": "[,]"}]',
+    ' \n[ "first" ,\n\t"second" ]\n',
+    '[true, false, null, "\\u00e9\\"quoted\\""]',
+    '[]',
+])
+def test_json_arrays_stream_across_read_boundaries(tmp_path, monkeypatch, read_size, content):
+    monkeypatch.setattr(readers, 'JSON_READ_SIZE', read_size)
+    assert read_json(tmp_path, content) == [json.dumps(item) for item in json.loads(content)]
+
+
+@pytest.mark.parametrize('read_size', [1, 3, 1024])
+@pytest.mark.parametrize('content', [
+    '[1 2]',
+    '[{"a": 1} {"b": 2}]',
+    '["a" "b"]',
+    '[1, 2',
+    '[1,',
+    '[{"a": [1, 2}',
+    '["unterminated',
+    '[',
+])
+def test_malformed_json_arrays_raise(tmp_path, monkeypatch, read_size, content):
+    monkeypatch.setattr(readers, 'JSON_READ_SIZE', read_size)
+    with pytest.raises(ValueError):
+        read_json(tmp_path, content)
+
+
+def test_txt_and_jsonl_are_counted_by_line(tmp_path):
+    txt = tmp_path / 'input.txt'
+    txt.write_text('a\nb\nc')
+    jsonl = tmp_path / 'input.jsonl'
+    jsonl.write_text('{"a": 1}\n{"a": 2}\n')
+    assert readers.count_items(str(txt)) == 3
+    assert readers.count_items(str(jsonl)) == 2
+    assert readers.count_items([str(txt), str(jsonl)]) == 5
+
+
+def test_blank_lines_only_make_the_count_an_overestimate(tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_text('a\n\n  \nb\n')
+    assert readers.count_items(str(path)) == 4
+    assert len(list(readers.iter_texts(str(path)))) == 2
+
+
+def test_csv_count_leaves_out_the_header(tmp_path):
+    pytest.importorskip('pandas')
+    pytest.importorskip('chardet')
+    path = tmp_path / 'input.csv'
+    path.write_text('name,text\na,one\nb,two\n')
+    assert readers.count_items(str(path), header=True) == 2
+    assert readers.count_items(str(path)) == 3
+
+
+def test_small_json_arrays_are_counted_exactly(tmp_path):
+    path = tmp_path / 'input.json'
+    path.write_text(json.dumps([{"text": str(i)} for i in range(50)]))
+    assert readers.count_items(str(path)) == 50
+
+
+def test_large_json_arrays_are_estimated_from_their_head(tmp_path, monkeypatch):
+    monkeypatch.setattr(readers, 'JSON_READ_SIZE', 4096)
+    path = tmp_path / 'input.json'
+    path.write_text(json.dumps([{"text": f"row {i:05d}"} for i in range(5000)], indent=2))
+    assert 4500 <= readers.count_items(str(path)) <= 5500
@@ -0,0 +1,11 @@
+from backend.registry import ModelRegistry, resolve_device
+
+
+def test_the_default_device_shares_an_entry_with_its_name(tiny_model):
+    registry = ModelRegistry()
+    model, _ = registry.get(tiny_model)
+    device = resolve_device(None)
+
+    assert registry.is_loaded(tiny_model, device)
+    assert registry.get(tiny_model, device) == (model, 0.0)
+    assert len(registry.models) == 1
@@ -0,0 +1,118 @@
+from concurrent.futures import Future
+
+import numpy as np
+
+from backend.pipeline import AsyncWriter
+from backend.scheduler import Batch, BatchScheduler
+
+
+def encode(texts):
+    # Stands in for the model: the vector of a text is its length, repeated.
+    return np.array([[len(text)] * 2 for text in texts], dtype=np.float32)
+
+
+def run(scheduler, rows):
+    """Writes every batch through AsyncWriter, as the engine does, and returns the buffer and the batches."""
+    writer = AsyncWriter(np.zeros((rows, 2), dtype=np.float32), 4)
+    batches = []
+    for batch_number, batch in enumerate(scheduler):
+        batches.append(batch)
+        future = None
+        if batch.texts is not None:
+            future = Future()
+            future.set_result(encode(batch.texts))
+        writer.write(batch_number, batch, future)
+    writer.close()
+    writer.check()
+    return writer.embeddings, batches
+
+
+def test_repeated_texts_are_encoded_once():
+    texts = ['a', 'bb', 'a', 'ccc', 'bb', 'a', 'dddd', 'a']
+    scheduler = BatchScheduler(iter(texts), 2)
+    embeddings, batches = run(scheduler, len(texts))
+
+    encoded = [text for batch in batches if batch.texts for text in batch.texts]
+    assert sorted(encoded) == ['a', 'bb', 'ccc', 'dddd']
+    assert scheduler.duplicate_rows == 4
+    assert embeddings[:, 0].tolist() == [len(text) for text in texts]
+    assert sorted(row for batch in batches for row in batch.rows) == list(range(len(texts)))
+
+
+def test_repeats_in_a_different_order_get_their_own_vectors():
+    texts = ['alpha', 'bb', 'ccccccc', 'dddddddddddd', 'alpha', 'ccccccc', 'bb', 'dddddddddddd']
+    scheduler = BatchScheduler(iter(texts), 4)
+    embeddings, batches = run(scheduler, len(texts))
+
+    copies = [batch for batch in batches if batch.source_rows is not None]
+    assert [list(batch.source_rows) for batch in copies] == [[0, 2, 1, 3]]
+    assert embeddings[:, 0].tolist() == [len(text) for text in texts]
+
+
+def test_texts_that_only_differ_in_whitespace_share_a_vector():
+    scheduler = BatchScheduler(iter(['a  b', 'a b']), 8)
+    _, batches = run(scheduler, 2)
+    assert [batch.texts for batch in batches if batch.texts] == [['a  b']]
+
+
+def test_forgotten_texts_are_encoded_again():
+    texts = ['a', 'b', 'c', 'a']
+    scheduler = BatchScheduler(iter(texts), 1, max_written_keys=2)
+    embeddings, batches = run(scheduler, len(texts))
+
+    encoded = [text for batch in batches if batch.texts for text in batch.texts]
+    assert encoded == ['a', 'b', 'c', 'a']
+    assert scheduler.duplicate_rows == 0
+    assert len(scheduler.written_by_key) == 2
+    assert embeddings[:, 0].tolist() == [1, 1, 1, 1]
+
+
+def test_copies_of_a_failed_batch_count_as_errors():
+    embeddings = np.zeros((4, 2), dtype=np.float32)
+    errors = []
+    writer = AsyncWriter(embeddings, 4, on_error=errors.append)
+    failed = Future()
+    failed.set_exception(RuntimeError("out of memory"))
+
+    # Rows 0 and 1 hold the same text; rows 2 and 3 are later copies of row 0.
+    writer.write(1, Batch([0, 1], ['a'], None, None, None, np.array([0, 0])), failed)
+    writer.write(1, Batch([2, 3], None, None, None, [0, 0], None))
+    writer.close()
+
+    assert writer.error_count == 4
+    assert writer.rows_written == 4
+    assert len(errors) == 1
+    assert not writer.embeddings.any()
+
+
+def test_sorted_batches_hold_texts_of_similar_length():
+    texts = ['x' * length for length in [3, 9, 1, 7, 5, 2, 8, 4, 6, 10]]
+    scheduler = BatchScheduler(iter(texts), 3, deduplicate=False, sort_by_length=True)
+    embeddings, batches = run(scheduler, len(texts))
+
+    assert [sorted(len(text) for text in batch.texts) for batch in batches] == [[8, 9, 10], [5, 6, 7], [2, 3, 4], [1]]
+    for batch in batches:
+        assert list(batch.rows) == sorted(batch.rows)
+    assert embeddings[:, 0].tolist() == [len(text) for text in texts]
+
+
+def test_token_budget_caps_the_padded_batch_size():
+    texts = ['x' * length for length in [10, 1, 2, 10, 3, 4, 5, 1]]
+    scheduler = BatchScheduler(iter(texts), 4, deduplicate=False, max_batch_tokens=12)
+    embeddings, batches = run(scheduler, len(texts))
+
+    for batch in batches:
+        if len(batch.texts) > 1:
+            assert len(batch.texts) * max(len(text) for text in batch.texts) <= 12
+    assert embeddings[:, 0].tolist() == [len(text) for text in texts]
+
+
+def test_committed_rows_never_pass_a_row_still_in_the_window():
+    texts = ['x' * (index % 5 + 1) for index in range(40)]
+    scheduler = BatchScheduler(iter(texts), 4, deduplicate=False, sort_by_length=True, sort_window=2)
+    written = set()
+    for batch in scheduler:
+        assert all(row in written for row in range(scheduler.committed_rows))
+        written.update(batch.rows)
+    assert scheduler.committed_rows == len(texts)
+    assert written == set(range(len(texts)))